@@ -1,27 +1,54 @@
-import ast
-import re
+# imports are deferred to where they are used, so that --version,
+# --list-configurations and runs from a saved model start quickly
 import os
-import shutil
-import urllib.request
-import urllib.error
-
-from pdftoregs.lex import lex
-from pdftoregs.parse import parse
+import sys
+import threading
 
 module_dir = os.path.dirname(os.path.abspath(__file__))
+download_lock = threading.Lock()
+
+def logger():
+  import logging
+  return logging.getLogger('pdftoregs')
 
 def getfile(url, fname):
+  with download_lock:
+    download(url, fname)
+
+def download(url, fname):
   if not os.path.exists(fname):
+    import urllib.request
+    import urllib.error
     os.makedirs(os.path.dirname(fname), exist_ok=True)
-    print('attempting to download {}'.format(url))
+    logger().info('attempting to download %s', url)
     try:
       urllib.request.urlretrieve(url, fname)
     except urllib.error.HTTPError:
-      print('File {} not found and URL {} could not be accessed. Please download the file manually.'.format(fname, url))
+      logger().error('File %s not found and URL %s could not be accessed. Please download the file manually.', fname, url)
       exit()
 
-def lex_manual(name, settings):
+def codegen_params(settings):
+  return { 'OutputDir'      : settings['OutputDir'],
+           'ExcludePeriphs' : settings['ExcludePeriphs']
+         }
+
+def lex_manual(name, settings, jobs=1, cache=True, manifest=None, stream=False,
+               batch=None, progress=False, exclude=True, lookahead=0):
+  from pdftoregs.lex import lex
+  from pdftoregs.lex.cache import TextCache
+  from pdftoregs.parse.translators.translator import BaseTranslator
   getfile(settings['PdfUrl'], settings['PdfFname'])
+  if cache:
+    cache = TextCache(settings['CacheDir'],
+                      settings['CacheSizeMB'] << 20)
+  else:
+    cache = None
+  if batch:
+    pool  = batch.pool
+    pages = batch.page_store(settings['PdfToTextBin'], settings['PdfFname'], cache,
+                             settings['TextBackend'], settings['TextStore'])
+  else:
+    pool = pages = None
   lexer = lex.LexPDF(name      = name,
                      pdftotext = settings['PdfToTextBin'],
                      pdf_fname = settings['PdfFname'],
@@ -31,55 +58,207 @@ def lex_manual(name, settings):
                                              'BitfieldHeader',
                                              'BitfieldLine',
                                             ] },
-                     exceptions = settings['RegisterExceptions'])
-  lexer.build(settings['EndOfToC'],
-              settings['SubsequentPages'],
-              settings['ExtraEntries'])
+                     exceptions = settings['RegisterExceptions'],
+                     jobs       = jobs,
+                     cache      = cache,
+                     stream     = stream,
+                     pool       = pool,
+                     pages      = pages,
+                     progress   = progress,
+                     backend    = settings['TextBackend'],
+                     engine     = settings['BitfieldEngine'],
+                     lookahead  = lookahead,
+                     store      = settings['TextStore'])
+  entries = lexer.build_toc(settings['EndOfToC'],
+                            settings['SubsequentPages'],
+                            settings['ExtraEntries'])
+  if exclude:
+    # excluded peripherals would not be generated, so skip their pages too
+    unit_name = BaseTranslator.new(settings['OutputLanguage']).unit_name
+    entries = lexer.exclude(entries,
+                            lambda name: unit_name(name) in settings['ExcludePeriphs'])
+  lexer.load_pages(entries)
+  if manifest:
+    entries = manifest.select(lexer, entries)
+  lexer.lex_entries(entries)
   if lexer.exceptions:
-    print('Skipped/could not lex: ' + '\n'.join(map(str, lexer.exceptions)))
+    logger().warning('Skipped/could not lex: %s', '\n'.join(map(str, lexer.exceptions)))
   return lexer.toc.t.root
 
 def parse_registers(lang, tree):
+  from pdftoregs.parse import parse
   codegen = parse.CodeGenerator(lang, tree)
   return codegen
 
-def main(name, settings):
+def load_manifest(name, settings):
+  from pdftoregs.common.manifest import Manifest
+  from pdftoregs.parse.translators.translator import BaseTranslator
+  return Manifest(os.path.join(settings['OutputDir'], name + '.manifest.json'),
+                  BaseTranslator.new(settings['OutputLanguage']),
+                  codegen_params(settings),
+                  { k : settings[k + 'Regex']
+                    for k in ['Section',
+                              'Register',
+                              'BitfieldHeader',
+                              'BitfieldLine',
+                             ] },
+                  settings['SubsequentPages'],
+                  settings['BitfieldEngine'])
+
+def main(name, settings, jobs=1, cache=True, incremental=True,
+         dump_model=None, from_model=None, stream=False, batch=None,
+         progress=False, lookahead=0):
+  import logging
+  from pdftoregs.parse import parse
   pdftotext   = settings['PdfToTextBin']
   lastToCPage = settings['EndOfToC']
 
-  toc = lex_manual(name, settings)
-  print(toc)
+  if from_model:
+    from pdftoregs.lex import model
+    manifest = None
+    with open(from_model) as f:
+      toc = model.load(f)
+  else:
+    # a dumped model has to hold every peripheral, fresh or not, and
+    # fingerprinting would hold every page in memory, or extract every
+    # page before lexing starts
+    if incremental and not dump_model and not stream and not lookahead:
+      manifest = load_manifest(name, settings)
+    else:
+      manifest = None
+    # a dumped model holds excluded peripherals too, for other configurations
+    toc = lex_manual(name, settings, jobs, cache, manifest, stream, batch,
+                     progress, exclude=not dump_model, lookahead=lookahead)
+  if logger().isEnabledFor(logging.DEBUG):
+    toc.render(sys.stdout)
+  if dump_model:
+    from pdftoregs.lex import model
+    with open(dump_model, 'w') as f:
+      model.dump(toc, f)
 
   source = parse.CodeGenerator(settings['OutputLanguage'],
                                toc,
-                               { 'OutputDir'      : settings['OutputDir'],
-                                 'ExcludePeriphs' : settings['ExcludePeriphs']
-                               })
+                               codegen_params(settings),
+                               jobs)
+  if manifest:
+    manifest.save()
+  return toc
 
 def get_args():
   import argparse
+  from pdftoregs import __version__
   argparser = argparse.ArgumentParser(
                 description=
                 """Extract text-converted pages from a PDF, given
                 a regex that locates them in the table of
                 contents.
                 """)
+  argparser.add_argument('--version', action='version',
+                         version='pdftoregs ' + __version__)
   argparser.add_argument('--cfgfile', type=str, nargs='?',
                          default=os.path.join(module_dir, 'scanpdf.cfg'))
-  argparser.add_argument('--configuration', type=str, nargs='?',
+  argparser.add_argument('--list-configurations', action='store_true',
                          help=
-                         """Name of the configuration to load from the config file.
+                         """List the configurations in the config file and exit.
+                         """)
+  argparser.add_argument('--configuration', type=str, nargs='+',
+                         help=
+                         """Names of the configurations to load from the config
+                         file, or all for every one. Several configurations are
+                         run concurrently, sharing worker processes.
                          """,
-                         default='TI_TMS320C5517')
-  return argparser.parse_args()
+                         default=['TI_TMS320C5517'])
+  argparser.add_argument('--jobs', '-j', type=int, default=1,
+                         help=
+                         """Number of worker processes to lex register tables with,
+                         and of configurations to run at once.
+                         """)
+  argparser.add_argument('--no-cache', dest='cache', action='store_false',
+                         help=
+                         """Always run pdftotext instead of reusing page text
+                         cached by earlier runs.
+                         """)
+  argparser.add_argument('--force', dest='incremental', action='store_false',
+                         help=
+                         """Lex and regenerate every peripheral, even those whose
+                         inputs did not change since the last run.
+                         """)
+  extraction = argparser.add_mutually_exclusive_group()
+  extraction.add_argument('--stream', action='store_true',
+                          help=
+                          """Lex pdftotext output as it arrives, holding only a few
+                          pages in memory at a time. Implies --force. Devices of a batch
+                          that share a PDF load its pages up front instead.
+                          """)
+  extraction.add_argument('--lookahead', metavar='K', type=int, default=0,
+                          help=
+                          """Lex register tables while pdftotext extracts the pages
+                          of up to K more, in processes of their own. Implies --force.
+                          Devices of a batch that share a PDF load its pages up
+                          front instead.
+                          """)
+  argparser.add_argument('--dump-model', metavar='FILE',
+                         help=
+                         """Save the lexed register tree to FILE.
+                         """)
+  argparser.add_argument('--from-model', metavar='FILE',
+                         help=
+                         """Generate code from a register tree saved with
+                         --dump-model instead of lexing the PDF.
+                         """)
+  argparser.add_argument('--profile', action='store_true',
+                         help=
+                         """Time each stage of the run and print a summary.
+                         """)
+  argparser.add_argument('--profile-json', metavar='FILE',
+                         help=
+                         """Time each stage of the run and write the timings to
+                         FILE as JSON.
+                         """)
+  verbosity = argparser.add_mutually_exclusive_group()
+  verbosity.add_argument('--quiet', '-q', action='store_true',
+                         help=
+                         """Report only warnings and errors.
+                         """)
+  verbosity.add_argument('--verbose', '-v', action='store_true',
+                         help=
+                         """Report every section, table and bitfield lexed, and
+                         print the register tree.
+                         """)
+  argparser.add_argument('--progress', action='store_true',
+                         help=
+                         """Show a count of the registers lexed so far.
+                         """)
+  args = argparser.parse_args()
+  if (len(args.configuration) > 1 or args.configuration == ['all']) and \
+     (args.dump_model or args.from_model):
+    argparser.error('--dump-model and --from-model take a single configuration')
+  return args
 
-def get_cfg(args):
+def read_cfg(args):
   import configparser
   cfgparser = configparser.ConfigParser()
   cfgparser.read(args.cfgfile)
-  configuration = cfgparser[args.configuration]
+  return cfgparser
+
+def get_cfgs(args):
+  cfgparser = read_cfg(args)
+  names = args.configuration
+  if names == ['all']:
+    names = cfgparser.sections()
+  return [get_cfg(args.cfgfile, name, cfgparser[name]) for name in names]
+
+def cache_dir():
+  # per user, as the XDG base directory spec places caches, so that page
+  # text is not written inside the package next to its config
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, 'pdftoregs')
 
-  config_dir = os.path.dirname(args.cfgfile)
+def get_cfg(cfgfile, name, configuration):
+  import ast
+  import re
+  import shutil
+  config_dir = os.path.dirname(cfgfile)
   def path(p):
     if os.path.isabs(p):
       return p
@@ -108,7 +287,52 @@ def get_cfg(args):
                  ('BitfieldLineRegex',   compileVerbose),
                ]
              }
-  return (args.configuration, settings)
+  settings.update({ k : f(configuration.get(k, default))
+                    for k, f, default in
+                    [ ('CacheDir',       path, cache_dir()),
+                      ('CacheSizeMB',    int,  '256'),
+                      ('TextBackend',    str,  'pdftotext'),
+                      ('BitfieldEngine', str,  'regex'),
+                      ('TextStore',      str,  'memory'),
+                    ]
+                  })
+  return (name, settings)
 
 if __name__ == '__main__':
-  main(*get_cfg(get_args()))
+  args = get_args()
+  if args.list_configurations:
+    print('\n'.join(read_cfg(args).sections()))
+    sys.exit()
+
+  import logging
+  from pdftoregs.common import profiling
+  logging.basicConfig(format='%(message)s',
+                      level=(logging.WARNING if args.quiet else
+                             logging.DEBUG if args.verbose else
+                             logging.INFO))
+  devices = get_cfgs(args)
+  options = dict(jobs        = args.jobs,
+                 cache       = args.cache,
+                 incremental = args.incremental,
+                 dump_model  = args.dump_model,
+                 from_model  = args.from_model,
+                 stream      = args.stream,
+                 progress    = args.progress,
+                 lookahead   = args.lookahead)
+  profiler = profiling.Profiler() if args.profile or args.profile_json else None
+  with profiling.enabled(profiler):
+    if len(devices) == 1:
+      main(*devices[0], **options)
+      summaries = []
+    else:
+      from pdftoregs.common.batch import Batch, Summary
+      with Batch(args.jobs) as batch:
+        summaries = batch.run(devices, main, **options)
+      print(Summary.table(summaries))
+  if args.profile:
+    print(profiler.report())
+  if args.profile_json:
+    with open(args.profile_json, 'w') as f:
+      profiler.dump(f)
+  if not all(summary.ok for summary in summaries):
+    sys.exit(1)
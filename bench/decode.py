@@ -0,0 +1,68 @@
+"""Decode throughput of register dumps, on the model of a synthetic manual.
+
+  python -m pdftoregs.bench.decode --peripherals 20 --registers 50 --bitfields 8
+
+Lexes the manual, then decodes dumps of random words covering all of its
+registers, one row per simulated board, --words words in all. Reports
+words per second of decoding into a structured array and of listing the
+fields that differ from reset, best of --repeat runs on one core.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..decode.dump import DumpDecoder
+from . import pipeline, results, synthetic
+
+BASE = 0x1000
+
+def lexed_device(manual):
+  run = pipeline.Run(manual, synthetic.regexes(), None)
+  run.toc()
+  run.lex()
+  return run.root
+
+def best(repeat, f, *args):
+  seconds = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    f(*args)
+    seconds = min(seconds, time.perf_counter() - start)
+  return seconds
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--peripherals', '-P', type=int, default=20)
+  argparser.add_argument('--registers',   '-R', type=int, default=50)
+  argparser.add_argument('--bitfields',   '-K', type=int, default=8)
+  argparser.add_argument('--words', type=int, default=20000000,
+                         help='words of all dumps together')
+  argparser.add_argument('--repeat', type=int, default=3)
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  manual = synthetic.Manual(args.peripherals, args.registers, args.bitfields, prose=0)
+  decoder = DumpDecoder(lexed_device(manual), base=BASE)
+  boards = max(1, args.words // decoder.words)
+  dumps = np.random.default_rng(0).integers(0, 1 << 16, (boards, decoder.words),
+                                            dtype=np.uint16)
+  print('{} registers, {} fields, {} dumps of {} words'.format(
+        args.peripherals * args.registers, len(decoder), boards, decoder.words))
+  measurements = {}
+  for name, f in [('decode',      decoder.decode),
+                  ('differences', lambda dumps: list(decoder.differences(dumps)))]:
+    seconds = best(args.repeat, f, dumps)
+    measurements[name + '.seconds'] = seconds
+    print('{:<12} {:>10.4f} s {:>10.1f} Mwords/s'.format(name, seconds,
+                                                        dumps.size / seconds / 1e6))
+  results.report(args,
+                 { 'peripherals' : args.peripherals,
+                   'registers'   : args.registers,
+                   'bitfields'   : args.bitfields,
+                   'words'       : int(dumps.size),
+                 },
+                 measurements)
+
+if __name__ == '__main__':
+  main()
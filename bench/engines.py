@@ -0,0 +1,88 @@
+"""Compare the bitfield table engines on a synthetic manual.
+
+  python -m pdftoregs.bench.engines --peripherals 20 --registers 50 --bitfields 8
+
+Lexes the same manual with each engine and reports registers per second,
+how many registers end up in lexer.exceptions and how many come out with
+other field names than the manual lists. Unless --no-quirks is given,
+some tables have wrapped field names, wrapped descriptions and drifting
+columns. Without a PDF the column engine reads words laid out from the
+page text, as it does for backends that report no word boxes. Both
+engines start with their input in memory, so only lexing is timed.
+"""
+import argparse
+import time
+
+from ..lex import lex
+from . import results, synthetic
+
+SUBSEQUENT_PAGES = 2
+
+def lex_manual(manual, regexes, engine):
+  lexer = lex.LexPDF(name       = 'synthetic',
+                     pdftotext  = None,
+                     pdf_fname  = None,
+                     regexes    = regexes,
+                     exceptions = [],
+                     pages      = manual.page_store(SUBSEQUENT_PAGES,
+                                                    words=engine == 'columns'),
+                     engine     = engine)
+  entries = lexer.build_toc(manual.end_of_toc, SUBSEQUENT_PAGES, {})
+  start = time.perf_counter()
+  lexer.load_pages(entries)
+  lexer.lex_entries(entries)
+  return lexer, entries, time.perf_counter() - start
+
+def mismatched(manual, lexer, entries):
+  return sum(1 for entry in entries
+             if entry.value.name not in lexer.exceptions and
+                [field.value.name for field in entry.children.values()] !=
+                manual.expected[entry.value.name])
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--peripherals', '-P', type=int, default=20)
+  argparser.add_argument('--registers',   '-R', type=int, default=50)
+  argparser.add_argument('--bitfields',   '-K', type=int, default=8)
+  argparser.add_argument('--prose', type=int, default=30,
+                         help='lines of prose before each table')
+  argparser.add_argument('--no-quirks', dest='quirks', action='store_false',
+                         help='lay every table out the same way')
+  argparser.add_argument('--repeat', type=int, default=3)
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  manual = synthetic.Manual(args.peripherals, args.registers, args.bitfields,
+                            args.prose, args.quirks)
+  regexes = synthetic.regexes()
+  registers = args.peripherals * args.registers
+  measurements = {}
+  print('{} peripherals x {} registers x {} bitfields{}'.format(
+        args.peripherals, args.registers, args.bitfields,
+        ', with quirks' if args.quirks else ''))
+  print('{:<10} {:>10} {:>14} {:>12} {:>12}'.format('engine', 'seconds', 'registers/s',
+                                                   'exceptions', 'mismatched'))
+  for engine in lex.engines:
+    best = float('inf')
+    for _ in range(args.repeat):
+      lexer, entries, seconds = lex_manual(manual, regexes, engine)
+      best = min(best, seconds)
+    exceptions = len(lexer.exceptions)
+    wrong = mismatched(manual, lexer, entries)
+    measurements.update({ engine + '.seconds'    : best,
+                          engine + '.exceptions' : exceptions,
+                          engine + '.mismatched' : wrong,
+                        })
+    print('{:<10} {:>10.4f} {:>14.0f} {:>12} {:>12}'.format(
+          engine, best, registers / best, exceptions, wrong))
+  results.report(args,
+                 { 'peripherals' : args.peripherals,
+                   'registers'   : args.registers,
+                   'bitfields'   : args.bitfields,
+                   'prose'       : args.prose,
+                   'quirks'      : args.quirks,
+                 },
+                 measurements)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,147 @@
+"""Resident memory of lexing a large synthetic manual, with page text
+kept in memory and with it mapped from a file.
+
+  python -m pdftoregs.bench.mapped --peripherals 30 --registers 100 --jobs 4
+
+Each store is measured in a fresh interpreter: the manual is lexed across
+a pool of --jobs worker processes, and the memory of the lexer and of
+every worker is then read from /proc (Linux only). RSS counts pages
+shared with other processes in full; PSS divides them between sharers;
+private counts only pages no other process maps; anon leaves out pages
+of files, like the mapped text, which the OS can drop and read again.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ..lex import lex
+from ..lex.mapped import MappedPages
+from ..lex.pages import PageStore
+from . import results, synthetic
+
+SUBSEQUENT_PAGES = 2
+
+class ManualBackend:
+  """Extracts the pages of a synthetic manual, as pdftotext would.
+  """
+  def __init__(self, manual):
+    self.manual = manual
+
+  def identity(self):
+    m = self.manual
+    return ('synthetic', m.peripherals, m.registers, m.bitfields, len(m.pages))
+
+  def extract(self, first, last):
+    return [self.manual.pages[n] for n in range(first, min(last, self.manual.last_page) + 1)]
+
+  def write(self, f):
+    for n in range(1, self.manual.last_page + 1):
+      f.write((self.manual.pages[n] + '\f').encode('utf-8'))
+
+def memory():
+  """Rss, Pss and private memory of this process in KiB.
+  """
+  fields = {}
+  with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+      name, _, value = line.partition(':')
+      if value.strip().endswith('kB'):
+        fields[name] = int(value.split()[0])
+  return { 'rss'     : fields['Rss'],
+           'pss'     : fields['Pss'],
+           'private' : fields['Private_Clean'] + fields['Private_Dirty'],
+           'anon'    : fields['Anonymous'],
+         }
+
+def worker_memory(_):
+  # long enough for every worker to pick up one of these
+  time.sleep(0.05)
+  return os.getpid(), memory()
+
+def measure(args, store):
+  manual = synthetic.Manual(args.peripherals, args.registers, args.bitfields, args.prose)
+  backend = ManualBackend(manual)
+  with tempfile.TemporaryDirectory() as directory:
+    pdf = os.path.join(directory, 'manual.pdf')
+    with open(pdf, 'wb') as f:
+      f.write(b'%PDF synthetic')
+    if store == 'mapped':
+      pages = PageStore(None, pdf, backend=backend, pages=MappedPages.open(backend, pdf))
+    else:
+      pages = PageStore(None, pdf, backend=backend)
+      pages.load(1, manual.last_page + SUBSEQUENT_PAGES)
+    # only the pages and the lexed tree should be left of the manual
+    del manual.pages, backend.manual
+    with ProcessPoolExecutor(args.jobs) as pool:
+      lexer = lex.LexPDF(name       = 'synthetic',
+                         pdftotext  = None,
+                         pdf_fname  = pdf,
+                         regexes    = synthetic.regexes(),
+                         exceptions = [],
+                         jobs       = args.jobs,
+                         pool       = pool,
+                         pages      = pages)
+      entries = lexer.build_toc(manual.end_of_toc, SUBSEQUENT_PAGES, {})
+      lexer.load_pages(entries)
+      lexer.lex_entries(entries)
+      workers = dict(pool.map(worker_memory, range(4 * args.jobs)))
+    return { 'pages'     : manual.last_page,
+             'registers' : len(entries),
+             'lexer'     : memory(),
+             'workers'   : list(workers.values()),
+           }
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--peripherals', '-P', type=int, default=30)
+  argparser.add_argument('--registers',   '-R', type=int, default=100)
+  argparser.add_argument('--bitfields',   '-K', type=int, default=8)
+  argparser.add_argument('--prose', type=int, default=30,
+                         help='lines of prose before each table')
+  argparser.add_argument('--jobs', '-j', type=int, default=4)
+  argparser.add_argument('--store', choices=['memory', 'mapped'],
+                         help='measure this store only, in this process')
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  if args.store:
+    json.dump(measure(args, args.store), sys.stdout)
+    return
+
+  stores = {}
+  for store in ['memory', 'mapped']:
+    out = subprocess.run([sys.executable, '-m', __spec__.name] + sys.argv[1:] +
+                         ['--store', store],
+                         stdout=subprocess.PIPE, check=True).stdout
+    stores[store] = json.loads(out)
+  print('{} pages, {} registers, {} workers'.format(
+        stores['memory']['pages'], stores['memory']['registers'], args.jobs))
+  print('{:<8} {:<8} {:>10} {:>10} {:>12} {:>10}'.format('store', 'process', 'RSS MiB',
+                                                         'PSS MiB', 'private MiB', 'anon MiB'))
+  measurements = {}
+  for store, result in stores.items():
+    rows = [('lexer', result['lexer'])]
+    rows += [('worker', m) for m in result['workers']]
+    for process, m in rows:
+      print('{:<8} {:<8} {:>10.1f} {:>10.1f} {:>12.1f} {:>10.1f}'.format(
+            store, process, *[m[k] / 1024 for k in ['rss', 'pss', 'private', 'anon']]))
+    # workers are alike, so their largest stands for them all
+    for k in ['rss', 'pss', 'private', 'anon']:
+      measurements['{}.lexer.{}_kib'.format(store, k)] = result['lexer'][k]
+      measurements['{}.worker.{}_kib'.format(store, k)] = max(m[k] for m in result['workers'])
+  results.report(args,
+                 { 'peripherals' : args.peripherals,
+                   'registers'   : args.registers,
+                   'bitfields'   : args.bitfields,
+                   'prose'       : args.prose,
+                   'jobs'        : args.jobs,
+                 },
+                 measurements)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,83 @@
+"""Memory footprint of the lexed register tree.
+
+Builds a synthetic device tree without touching a PDF and reports the
+memory allocated per node, e.g. for 50k bitfields:
+
+  python -m pdftoregs.bench.memory --peripherals 50 --registers 100 --bitfields 10
+
+memory.baseline.json holds the numbers of the tree before its nodes
+were slotted, for --compare.
+"""
+import argparse
+import sys
+import tracemalloc
+
+from ..datastruct.tree import Tree
+from ..lex import register
+from . import results
+
+def build(peripherals, registers, bitfields):
+  root = Tree([register.DeviceNode('synthetic')])
+  for p in range(peripherals):
+    periph = object.__new__(register.PeripheralNode)
+    periph.name = 'PERIPH{}'.format(p)
+    periph_t = root.add(periph)
+    for r in range(registers):
+      reg = register.RegisterNode.create({ 'name'   : 'P{}REG{}'.format(p, r),
+                                           'offset' : 0x1000 + r,
+                                           'reset'  : 0,
+                                           'page'   : 100 + r,
+                                         })
+      reg_t = periph_t.add(reg)
+      for b in range(bitfields):
+        field = register.BitfieldNode()
+        field.name = 'FIELD{}'.format(b)
+        field.physbits = field.logbits = (b, b)
+        field.reset = 0
+        reg_t.add(field)
+  return root
+
+def shallow_size(obj):
+  size = sys.getsizeof(obj)
+  d = getattr(obj, '__dict__', None)
+  if d is not None:
+    size += sys.getsizeof(d)
+  return size
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--peripherals', type=int, default=50)
+  argparser.add_argument('--registers',   type=int, default=100)
+  argparser.add_argument('--bitfields',   type=int, default=10)
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  tracemalloc.start()
+  before, _ = tracemalloc.get_traced_memory()
+  root = build(args.peripherals, args.registers, args.bitfields)
+  after, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  nodes = sum(1 for _ in root)
+  fields = args.peripherals * args.registers * args.bitfields
+  leaf = next(iter(next(iter(next(iter(root.children.values())).children.values())).children.values()))
+  print('nodes:               {}'.format(nodes))
+  print('bitfields:           {}'.format(fields))
+  print('allocated:           {:.1f} MiB'.format((after - before) / 2**20))
+  print('per node:            {:.0f} bytes'.format((after - before) / nodes))
+  print('tree node (shallow): {} bytes + children {} bytes'.format(
+        shallow_size(leaf), sys.getsizeof(leaf.children)))
+  print('bitfield (shallow):  {} bytes'.format(shallow_size(leaf.value)))
+  results.report(args,
+                 { 'peripherals' : args.peripherals,
+                   'registers'   : args.registers,
+                   'bitfields'   : args.bitfields,
+                 },
+                 { 'allocated_bytes' : after - before,
+                   'node_bytes'      : (after - before) / nodes,
+                   'tree_node_bytes' : shallow_size(leaf) + sys.getsizeof(leaf.children),
+                   'bitfield_bytes'  : shallow_size(leaf.value),
+                 })
+
+if __name__ == '__main__':
+  main()
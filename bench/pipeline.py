@@ -0,0 +1,126 @@
+"""Time each stage of the pipeline on a synthetic manual.
+
+Runs offline: the manual is generated in memory and its pages handed to
+the lexer directly, so neither the PDF nor pdftotext is needed.
+
+  python -m pdftoregs.bench.pipeline --peripherals 20 --registers 50 --bitfields 8
+
+Each stage is timed over --repeat runs and the best is reported, along
+with its throughput and, in a separate traced run, its peak memory.
+--json saves the results and --compare sets them beside saved ones.
+"""
+import argparse
+import contextlib
+import tempfile
+import time
+import tracemalloc
+
+from ..lex import lex
+from ..parse.translators.translator import BaseTranslator
+from . import results, synthetic
+
+SUBSEQUENT_PAGES = 2
+
+class Run:
+  """One pass over a manual, stage by stage.
+  """
+  def __init__(self, manual, regexes, outdir):
+    self.manual = manual
+    self.lexer = lex.LexPDF(name       = 'synthetic',
+                            pdftotext  = None,
+                            pdf_fname  = None,
+                            regexes    = regexes,
+                            exceptions = [],
+                            pages      = manual.page_store(SUBSEQUENT_PAGES))
+    self.outdir = outdir
+
+  def toc(self):
+    self.entries = self.lexer.build_toc(self.manual.end_of_toc, SUBSEQUENT_PAGES, {})
+
+  def lex(self):
+    self.lexer.lex_entries(self.entries)
+    self.root = self.lexer.toc.t.root
+
+  def traverse(self):
+    sum(1 for _ in self.root)
+    self.root.walk(None, lambda ctx, value: contextlib.nullcontext(ctx))
+    str(self.root)
+
+  def emit(self):
+    BaseTranslator.new('cpp').walk(self.root,
+                                   { 'OutputDir'      : self.outdir,
+                                     'ExcludePeriphs' : [] })
+
+  stages = ['toc', 'lex', 'traverse', 'emit']
+
+def measure(manual, regexes, repeat, memory):
+  """Best time and peak traced memory of each stage.
+  """
+  best = { stage : float('inf') for stage in Run.stages }
+  peak = {}
+  with tempfile.TemporaryDirectory() as outdir:
+    for _ in range(repeat):
+      run = Run(manual, regexes, outdir)
+      for stage in Run.stages:
+        start = time.perf_counter()
+        getattr(run, stage)()
+        best[stage] = min(best[stage], time.perf_counter() - start)
+    if memory:
+      run = Run(manual, regexes, outdir)
+      tracemalloc.start()
+      for stage in Run.stages:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        getattr(run, stage)()
+        peak[stage] = tracemalloc.get_traced_memory()[1] - before
+      tracemalloc.stop()
+  return best, peak
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--peripherals', '-P', type=int, default=20)
+  argparser.add_argument('--registers',   '-R', type=int, default=50)
+  argparser.add_argument('--bitfields',   '-K', type=int, default=8)
+  argparser.add_argument('--prose', type=int, default=30,
+                         help='lines of prose before each table')
+  argparser.add_argument('--repeat', type=int, default=3)
+  argparser.add_argument('--no-memory', dest='memory', action='store_false',
+                         help='skip the traced run measuring peak memory')
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  manual = synthetic.Manual(args.peripherals, args.registers, args.bitfields,
+                            args.prose)
+  best, peak = measure(manual, synthetic.regexes(), args.repeat, args.memory)
+
+  registers = args.peripherals * args.registers
+  lines = { 'toc'      : manual.lines(1, manual.end_of_toc),
+            'lex'      : manual.lines(manual.end_of_toc + 1, manual.last_page),
+            'traverse' : 0,
+            'emit'     : 0,
+          }
+  measurements = {}
+  print('{} peripherals x {} registers x {} bitfields, {} pages'.format(
+        args.peripherals, args.registers, args.bitfields, manual.last_page))
+  print('{:<10} {:>10} {:>12} {:>14} {:>10}'.format('stage', 'seconds', 'lines/s',
+                                                  'registers/s', 'peak MiB'))
+  for stage in Run.stages:
+    seconds = best[stage]
+    measurements.update({ stage + '.seconds'    : seconds,
+                          stage + '.peak_bytes' : peak.get(stage),
+                        })
+    print('{:<10} {:>10.4f} {:>12} {:>14.0f} {:>10}'.format(
+          stage, seconds,
+          '{:.0f}'.format(lines[stage] / seconds) if lines[stage] else '-',
+          registers / seconds,
+          '{:.1f}'.format(peak[stage] / 2**20) if stage in peak else '-'))
+  results.report(args,
+                 { 'peripherals' : args.peripherals,
+                   'registers'   : args.registers,
+                   'bitfields'   : args.bitfields,
+                   'prose'       : args.prose,
+                 },
+                 measurements)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,48 @@
+"""Per-register overhead of the bitfield lexer.
+
+Lexes the same short table over and over, so the time per register is
+dominated by setting up the FilterTree rather than by matching lines.
+
+  python -m pdftoregs.bench.regexes [--registers N]
+
+regexes.baseline.json holds the numbers of the lexer before it compiled
+its patterns once per run, for --compare.
+"""
+import argparse
+import time
+
+from ..lex import lex
+from . import results, synthetic
+
+def main():
+  argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argparser.add_argument('--registers', type=int, default=20000)
+  argparser.add_argument('--bitfields', type=int, default=4)
+  argparser.add_argument('--repeat', type=int, default=3)
+  results.add_arguments(argparser)
+  args = argparser.parse_args()
+
+  manual = synthetic.Manual(1, 1, args.bitfields, prose=0)
+  text = manual.pages[manual.last_page]
+  regexes = synthetic.regexes()
+  header_re, line_re = regexes['BitfieldHeader'], regexes['BitfieldLine']
+
+  best = float('inf')
+  for _ in range(args.repeat):
+    start = time.perf_counter()
+    for _ in range(args.registers):
+      fields, complete, _ = lex.lex_table('P0R0', text, header_re, line_re)
+    best = min(best, time.perf_counter() - start)
+  assert len(fields) == args.bitfields and complete
+  print('{} registers of {} bitfields: {:.3f} s, {:.1f} us per register'.format(
+        args.registers, args.bitfields, best, best / args.registers * 1e6))
+  results.report(args,
+                 { 'registers' : args.registers,
+                   'bitfields' : args.bitfields,
+                 },
+                 { 'seconds'         : best,
+                   'us_per_register' : best / args.registers * 1e6,
+                 })
+
+if __name__ == '__main__':
+  main()
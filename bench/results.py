@@ -0,0 +1,48 @@
+"""Benchmark results saved as JSON, for later runs to compare with.
+
+A results file holds the parameters a benchmark ran with and a flat dict
+of what it measured. Comparing first checks the parameters match, as
+numbers measured on manuals of different sizes say nothing about each
+other.
+"""
+import json
+
+def add_arguments(argparser):
+  argparser.add_argument('--json', metavar='FILE',
+                         help='also write the results to FILE')
+  argparser.add_argument('--compare', metavar='FILE',
+                         help="""compare the results with those saved in FILE
+                         by an earlier run with --json""")
+
+def save(fname, params, measurements):
+  with open(fname, 'w') as f:
+    json.dump({ 'params'       : params,
+                'measurements' : measurements,
+              }, f, indent=2, sort_keys=True)
+    f.write('\n')
+
+def compare(fname, params, measurements):
+  """Print each measurement next to the one saved in fname, and the
+  ratio of the two.
+  """
+  with open(fname) as f:
+    saved = json.load(f)
+  if saved['params'] != params:
+    raise SystemExit('{} was measured with {}, not {}'.format(fname, saved['params'],
+                                                              params))
+  print('compared with {}'.format(fname))
+  print('{:<24} {:>14} {:>14} {:>8}'.format('', 'saved', 'now', 'ratio'))
+  for k, now in measurements.items():
+    before = saved['measurements'].get(k)
+    if before is None or now is None:
+      continue
+    print('{:<24} {:>14.6g} {:>14.6g} {:>8}'.format(
+          k, before, now, '{:.2f}'.format(now / before) if before else '-'))
+
+def report(args, params, measurements):
+  """Save and compare measurements as the arguments of add_arguments() ask.
+  """
+  if args.compare:
+    compare(args.compare, params, measurements)
+  if args.json:
+    save(args.json, params, measurements)
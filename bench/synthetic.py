@@ -0,0 +1,152 @@
+"""Synthetic manuals, laid out the way pdftotext -layout prints them.
+
+A manual has a table of contents listing every peripheral and register,
+followed by one page per register holding some prose and its bitfield
+table. The text matches the regexes of the TI_TMS320C5517 section of
+scanpdf.cfg, so it can be lexed without the real PDF.
+
+With quirks, some tables are laid out as real manuals often are: a long
+field name wraps onto the next line, a description wraps, or the Type
+and Reset columns drift right of their headings. With split, some
+tables run onto the next page.
+"""
+import configparser
+import os
+import re
+
+from ..datastruct.tree import Tree
+from ..lex import register
+from ..lex.columns import Words
+from ..lex.pages import PageStore
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def regexes(section='TI_TMS320C5517',
+            cfgfile=os.path.join(package_dir, 'scanpdf.cfg')):
+  """The lexer regexes of a cfg section, compiled as get_cfg does.
+  """
+  cfgparser = configparser.ConfigParser()
+  cfgparser.read(cfgfile)
+  return { k : re.compile(cfgparser[section][k + 'Regex'], re.VERBOSE)
+           for k in ['Section',
+                     'Register',
+                     'BitfieldHeader',
+                     'BitfieldLine',
+                    ] }
+
+def device(peripherals, name='dev'):
+  """A device tree built directly rather than lexed. peripherals is a
+  list of (name, registers), each register a tuple of (name, offset,
+  reset, page, fields) and each field one of (name, physbits, reset).
+  """
+  root = Tree([register.DeviceNode(name)])
+  for periph_name, registers in peripherals:
+    periph = object.__new__(register.PeripheralNode)
+    periph.name = periph_name
+    periph_t = root.add(periph)
+    for reg_name, offset, reset, page, fields in registers:
+      reg_t = periph_t.add(register.RegisterNode.create({ 'name'   : reg_name,
+                                                          'offset' : offset,
+                                                          'reset'  : reset,
+                                                          'page'   : page,
+                                                        }))
+      for field_name, physbits, field_reset in fields:
+        field = register.BitfieldNode()
+        field.name = field_name
+        field.physbits = field.logbits = physbits
+        field.reset = field_reset
+        reg_t.add(field)
+  return root
+
+class Manual:
+  """Pages of a synthetic manual, numbered from 1 as pdftotext does.
+  """
+  toc_entries_per_page = 60
+  heading = '  Bit     Field     Type   Reset  Description\n'
+
+  def __init__(self, peripherals, registers, bitfields, prose=30, quirks=False,
+               split=False):
+    if not 1 <= bitfields <= 16:
+      raise ValueError('registers are 16 bits wide, so 1 to 16 bitfields')
+    self.peripherals = peripherals
+    self.registers = registers
+    self.bitfields = bitfields
+    self.quirks = quirks
+    # field names of each register, as a lexer should find them
+    self.expected = {}
+    n_registers = peripherals * registers
+    n_toc = peripherals + n_registers
+    self.end_of_toc = max(1, -(-n_toc // self.toc_entries_per_page))
+
+    toc = []
+    self.pages = {}
+    page = self.end_of_toc + 1
+    for p in range(peripherals):
+      toc.append('{}     Periph{} Module (P{}) ........ {}'.format(p + 1, p, p, page))
+      for r in range(registers):
+        name = 'P{}R{}'.format(p, r)
+        toc.append('   {}.1.{}   Control Register ({}) [offset = {:04X}h] '
+                   '[reset = 0000h] ....... {}'.format(p + 1, r + 1, name,
+                                                       (0x1000 + p*0x40 + r) & 0xffff,
+                                                       page))
+        self.pages[page] = self.table_page(p, r, name, prose)
+        page += 1
+        if split and r % 4 == 1:
+          # break the table after half its fields
+          lines = self.pages[page - 1].splitlines(True)
+          cut = lines.index(self.heading) + 1 + self.bitfields // 2
+          self.pages[page - 1] = ''.join(lines[:cut])
+          self.pages[page] = ''.join(lines[cut:])
+          page += 1
+    self.last_page = page - 1
+    for n in range(self.end_of_toc):
+      self.pages[n + 1] = '\n'.join(toc[n*self.toc_entries_per_page:
+                                        (n + 1)*self.toc_entries_per_page]) + '\n'
+
+  def table_page(self, p, r, name, prose):
+    lines = ['   The {} register controls part of peripheral P{}, as described '
+             'in Section 4.2 of this guide. See Table 1-2.'.format(name, p)] * prose
+    lines += ['',
+              'Table {}-{}. Control Register ({}) Field Descriptions'.format(p + 1, r + 1, name),
+              self.heading.rstrip('\n')]
+    wrap_name = self.quirks and r % 3 == 1
+    wrap_desc = self.quirks and r % 5 == 2
+    drift = ' ' * 3 if self.quirks and r % 7 == 3 else ''
+    names = self.expected[name] = []
+    hi = 15
+    for b in range(self.bitfields):
+      # spread the 16 bits over the fields, the first ones widest
+      width = 16 // self.bitfields + (b < 16 % self.bitfields)
+      lo = hi - width + 1
+      fname = 'Reserved' if b == 0 else 'F{}'.format(b)
+      if wrap_name and b > 0:
+        fname += '_'
+      if lo == hi:
+        line = '  {}       {}      {}R/W    0h     desc'.format(hi, fname, drift)
+      else:
+        line = '  {}-{}    {}      {}R/W    0h     desc'.format(hi, lo, fname, drift)
+      lines.append(line)
+      if wrap_name and b > 0:
+        lines.append(' ' * line.index(fname) + 'CTL')
+        fname += 'CTL'
+      if wrap_desc:
+        lines.append(' ' * 34 + 'continued')
+      names.append('__reserved0' if b == 0 else fname)
+      hi = lo - 1
+    return '\n'.join(lines) + '\n'
+
+  def lines(self, first, last):
+    return sum(self.pages.get(n, '').count('\n') for n in range(first, last + 1))
+
+  def page_store(self, subsequent_pages, words=False):
+    """A PageStore already holding every page a lexer may read, and
+    with words the words on them as well, so lexing never runs pdftotext.
+    """
+    store = PageStore(None, None)
+    store.pages.update(self.pages)
+    for n in range(self.last_page + 1, self.last_page + subsequent_pages + 1):
+      # pages past the end of the document come back empty
+      store.pages[n] = ''
+    if words:
+      store.words.update((n, Words.from_layout(text)) for n, text in store.pages.items())
+    return store
@@ -0,0 +1,20 @@
+import collections
+import tempfile
+import unittest
+from pdftoregs.bench import pipeline, synthetic
+
+class TestSyntheticManual(unittest.TestCase):
+  def test_lexes_completely(self):
+    manual = synthetic.Manual(3, 25, 6, prose=2)
+    with tempfile.TemporaryDirectory() as outdir:
+      run = pipeline.Run(manual, synthetic.regexes(), outdir)
+      for stage in run.stages:
+        getattr(run, stage)()
+    self.assertGreater(manual.end_of_toc, 1)
+    self.assertEqual(run.lexer.exceptions, [])
+    counts = collections.Counter(type(node.value).__name__ for node in run.root)
+    self.assertEqual((counts['PeripheralNode'], counts['RegisterNode'], counts['BitfieldNode']),
+                     (3, 75, 450))
+
+if __name__ == '__main__':
+  unittest.main()
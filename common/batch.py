@@ -0,0 +1,139 @@
+import collections
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from ..lex import register
+from ..lex.pages import open_store
+
+log = logging.getLogger(__name__)
+
+class Batch:
+  """State shared by the devices of one run.
+
+  Devices run on threads of their own. Their register tables are lexed
+  on one shared process pool, and devices read from the same PDF share
+  one PageStore, so its pages are extracted once.
+
+  Streaming and lookahead extract pages as each device reaches them,
+  outside the store's lock, and streamed pages are not kept for other
+  devices, so devices sharing a store are run without either and load
+  their pages up front instead.
+  """
+  def __init__(self, jobs):
+    self.jobs = jobs
+    self.pool = ProcessPoolExecutor(jobs) if jobs > 1 else None
+    self.stores = {}
+    self.lock = threading.Lock()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, etype, evalue, tb):
+    if self.pool:
+      self.pool.shutdown()
+
+  @staticmethod
+  def store_key(pdftotext, pdf_fname, cache_dir, backend, store):
+    return (backend, store, pdftotext, os.path.abspath(pdf_fname), cache_dir)
+
+  def page_store(self, pdftotext, pdf_fname, cache, backend='pdftotext',
+                 store='memory'):
+    key = self.store_key(pdftotext, pdf_fname, cache.directory if cache else None,
+                         backend, store)
+    with self.lock:
+      try:
+        return self.stores[key]
+      except KeyError:
+        pages = self.stores[key] = open_store(pdftotext, pdf_fname, cache,
+                                              backend, store)
+        return pages
+
+  def run(self, devices, main, **kwargs):
+    """Call main(name, settings, batch=self, **kwargs) for every
+    (name, settings) in devices, returning a Summary for each in order.
+    """
+    keys = [self.settings_key(settings, kwargs.get('cache', True))
+            for _, settings in devices]
+    sharing = collections.Counter(keys)
+    with ThreadPoolExecutor(max(1, self.jobs)) as threads:
+      futures = [threads.submit(self.run_device, main, name, settings,
+                                self.device_options(name, kwargs,
+                                                    key and sharing[key] > 1))
+                 for (name, settings), key in zip(devices, keys)]
+      return [future.result() for future in futures]
+
+  def settings_key(self, settings, cache):
+    """store_key() of the PageStore page_store() gives a device.
+    """
+    try:
+      return self.store_key(settings['PdfToTextBin'],
+                            settings['PdfFname'],
+                            settings['CacheDir'] if cache else None,
+                            settings['TextBackend'],
+                            settings['TextStore'])
+    except KeyError:
+      # not a device that reads a PDF
+      return None
+
+  @staticmethod
+  def device_options(name, kwargs, shared):
+    if shared and (kwargs.get('stream') or kwargs.get('lookahead')):
+      log.info('%s shares its PDF with another device, so its pages are '
+               'loaded up front rather than streamed or looked ahead', name)
+      return dict(kwargs, stream=False, lookahead=0)
+    return kwargs
+
+  def run_device(self, main, name, settings, kwargs):
+    start = time.perf_counter()
+    try:
+      toc = main(name, settings, batch=self, **kwargs)
+      error = None
+    except Exception as e:
+      toc = None
+      error = e
+    return Summary(name, toc, settings['RegisterExceptions'],
+                   time.perf_counter() - start, error)
+
+class Summary:
+  """What one device of a batch produced.
+  """
+  columns = ['device', 'peripherals', 'registers', 'bitfields',
+             'skipped', 'seconds', 'status']
+
+  def __init__(self, name, toc, exceptions, seconds, error=None):
+    self.name = name
+    self.counts = { cls : 0 for cls in [register.PeripheralNode,
+                                        register.RegisterNode,
+                                        register.BitfieldNode] }
+    for node in toc or []:
+      if type(node.value) in self.counts:
+        self.counts[type(node.value)] += 1
+    self.skipped = len(exceptions)
+    self.seconds = seconds
+    self.error = error
+
+  @property
+  def ok(self):
+    return self.error is None
+
+  def row(self):
+    return [self.name,
+            self.counts[register.PeripheralNode],
+            self.counts[register.RegisterNode],
+            self.counts[register.BitfieldNode],
+            self.skipped,
+            '{:.1f}'.format(self.seconds),
+            'ok' if self.ok else 'failed: {}'.format(self.error)]
+
+  @classmethod
+  def table(cls, summaries):
+    rows = [cls.columns] + [summary.row() for summary in summaries]
+    widths = [max(len(str(row[i])) for row in rows)
+              for i in range(len(cls.columns) - 1)]
+    return '\n'.join('  '.join(str(cell).ljust(width)
+                               for cell, width in zip(row, widths)) +
+                     '  ' + str(row[-1])
+                     for row in rows)
@@ -0,0 +1,42 @@
+import contextlib
+import os
+import stat
+import tempfile
+
+def _read_umask():
+  # the umask can only be read by setting it, so this is done once, before
+  # any threads write files
+  mask = os.umask(0o22)
+  os.umask(mask)
+  return mask
+
+_umask = _read_umask()
+
+@contextlib.contextmanager
+def atomic_write(fname, mode='wb'):
+  """Open a temporary file next to fname, renamed over fname once the
+  block exits cleanly, so readers never see a partly written file.
+
+  The file keeps the permissions of the one it replaces, or gets those
+  open() would give a new one, rather than the 0600 of mkstemp.
+  """
+  directory = os.path.dirname(os.path.abspath(fname))
+  fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+  try:
+    try:
+      perms = stat.S_IMODE(os.stat(fname).st_mode)
+    except FileNotFoundError:
+      perms = 0o666 & ~_umask
+    os.fchmod(fd, perms)
+    with os.fdopen(fd, mode) as f:
+      yield f
+    os.replace(tmp, fname)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+
+def write_atomic(fname, data):
+  """Write bytes to fname whole, as atomic_write() does.
+  """
+  with atomic_write(fname) as f:
+    f.write(data)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+
+from .files import atomic_write
+
+log = logging.getLogger(__name__)
+
+class Manifest:
+  """Record of what the last run generated, per peripheral.
+
+  Each peripheral is fingerprinted from its ToC entries, the page text
+  of its register tables, or their words for the columns engine, the
+  regexes and engine used to lex them and the translator version. A peripheral whose fingerprint matches the
+  manifest and whose outputs all still exist is fresh: it is neither
+  lexed nor emitted again, so its files keep their mtimes.
+  """
+  version = 1
+
+  def __init__(self, fname, translator, params, regexes, subsequent_pages,
+               engine='regex'):
+    self.fname = fname
+    self.translator = translator
+    self.params = params
+    self.engine = engine
+    self.salt = [self.version,
+                 type(translator).__module__,
+                 translator.version,
+                 subsequent_pages,
+                 engine]
+    for k in sorted(regexes):
+      self.salt += [k, regexes[k].pattern, regexes[k].flags]
+    try:
+      with open(fname) as f:
+        self.recorded = json.load(f)
+      if self.recorded.get('version') != self.version:
+        self.recorded = {}
+    except (FileNotFoundError, ValueError):
+      self.recorded = {}
+    self.peripherals = {}
+
+  @staticmethod
+  def update(h, *parts):
+    for part in parts:
+      h.update(str(part).encode('utf-8'))
+      h.update(b'\0')
+
+  def excluded(self, name):
+    return self.translator.unit_name(name) in self.params['ExcludePeriphs']
+
+  def fingerprint(self, lexer, periph):
+    h = hashlib.sha256()
+    self.update(h, *self.salt)
+    excluded = self.excluded(periph.value.name)
+    self.update(h, periph.value.name, excluded)
+    for entry in periph.children.values():
+      v = entry.value
+      self.update(h, v.name, v.offset, v.reset, v.page)
+      if excluded or v.name in lexer.exceptions:
+        continue
+      if self.engine == 'columns':
+        # what the engine lexes, already loaded for it
+        self.update(h, *(words.to_tsv() for words in lexer.table_words(entry)))
+      else:
+        self.update(h, lexer.table_text(entry))
+    return h.hexdigest()
+
+  def fresh(self, name, fingerprint):
+    try:
+      recorded = self.recorded['peripherals'][name]
+    except KeyError:
+      return False
+    return (recorded['fingerprint'] == fingerprint and
+            all(map(os.path.exists, recorded['outputs'])))
+
+  def select(self, lexer, entries):
+    """Drop fresh peripherals from the lexer's tree, returning the
+    entries that still need lexing.
+    """
+    root = lexer.toc.t.root
+    stale = set()
+    for periph in list(root.children.values()):
+      name = periph.value.name
+      fingerprint = self.fingerprint(lexer, periph)
+      self.peripherals[name] = fingerprint
+      if self.fresh(name, fingerprint):
+        del root.children[periph.key]
+      else:
+        stale.add(id(periph))
+    log.info('%d of %d peripherals up to date',
+             len(self.peripherals) - len(stale), len(self.peripherals))
+    return [entry for entry in entries
+            if id(entry.parent) in stale]
+
+  def save(self):
+    peripherals = {}
+    for name, fingerprint in self.peripherals.items():
+      outputs = [fname for fname in self.translator.outputs(name, self.params)
+                 if os.path.exists(fname)]
+      peripherals[name] = { 'fingerprint' : fingerprint,
+                            'outputs'     : outputs,
+                          }
+    directory = os.path.dirname(os.path.abspath(self.fname))
+    os.makedirs(directory, exist_ok=True)
+    with atomic_write(self.fname, 'w') as f:
+      json.dump({ 'version'     : self.version,
+                  'peripherals' : peripherals,
+                }, f, indent=2, sort_keys=True)
@@ -0,0 +1,154 @@
+"""Wall time, call counts and text volume per pipeline stage.
+
+Profiling is off unless a Profiler is enabled, and then stage() and
+timed() cost nothing more than a check. Work done in worker processes is
+collected in a Profiler of its own and merged back from its data().
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_enabled = None
+_local = threading.local()
+
+def active():
+  """The Profiler collecting for this thread, or None.
+  """
+  return getattr(_local, 'profiler', None) or _enabled
+
+@contextmanager
+def enabled(profiler):
+  """Collect into profiler, from every thread, for the block.
+  """
+  global _enabled
+  previous, _enabled = _enabled, profiler
+  try:
+    yield profiler
+  finally:
+    _enabled = previous
+
+@contextmanager
+def collecting():
+  """Collect into a fresh Profiler, for this thread only, for the block.
+  """
+  previous = getattr(_local, 'profiler', None)
+  profiler = _local.profiler = Profiler()
+  try:
+    yield profiler
+  finally:
+    _local.profiler = previous
+
+class _Stage:
+  __slots__ = ('profiler', 'name', 'bytes', 'start')
+
+  def __init__(self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+    self.bytes = 0
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, etype, evalue, tb):
+    self.profiler.add(self.name, time.perf_counter() - self.start, self.bytes)
+
+class _NoStage:
+  """Stands in for a stage while profiling is off; whatever is recorded
+  on it is dropped.
+  """
+  bytes = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, etype, evalue, tb):
+    pass
+
+  def __setattr__(self, name, value):
+    pass
+
+_no_stage = _NoStage()
+
+def stage(name):
+  """Context manager timing one call of a stage. Set bytes on the
+  object it returns to record how much text the call processed.
+  """
+  profiler = active()
+  if profiler is None:
+    return _no_stage
+  return _Stage(profiler, name)
+
+def timed(name, f):
+  """f itself while profiling is off, otherwise f wrapped to time each
+  call as a stage. Meant for hot functions, looked up once per loop.
+  """
+  profiler = active()
+  if profiler is None:
+    return f
+  def wrapper(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return f(*args, **kwargs)
+    finally:
+      profiler.add(name, time.perf_counter() - start)
+  return wrapper
+
+class Profiler:
+  def __init__(self):
+    self.stages = {}
+    self.registers = {}
+    self.lock = threading.Lock()
+
+  def add(self, name, seconds, nbytes=0, calls=1):
+    with self.lock:
+      s = self.stages.setdefault(name, [0, 0.0, 0])
+      s[0] += calls
+      s[1] += seconds
+      s[2] += nbytes
+
+  def register(self, device, name, seconds, nbytes):
+    with self.lock:
+      r = self.registers.setdefault('{}/{}'.format(device, name), [0.0, 0])
+      r[0] += seconds
+      r[1] += nbytes
+
+  def data(self):
+    """Plain, picklable form of what was collected.
+    """
+    with self.lock:
+      return { 'stages'    : { name : { 'calls'   : calls,
+                                        'seconds' : seconds,
+                                        'bytes'   : nbytes }
+                               for name, (calls, seconds, nbytes) in self.stages.items() },
+               'registers' : { name : { 'seconds' : seconds,
+                                        'bytes'   : nbytes }
+                               for name, (seconds, nbytes) in self.registers.items() },
+             }
+
+  def merge(self, data):
+    for name, s in data['stages'].items():
+      self.add(name, s['seconds'], s['bytes'], s['calls'])
+    for name, r in data['registers'].items():
+      device, _, register = name.rpartition('/')
+      self.register(device, register, r['seconds'], r['bytes'])
+
+  def report(self, top=10):
+    """Stages sorted by total time, then the slowest registers. Stages
+    nest, e.g. RegexTree.feed runs inside BitfieldTree.
+    """
+    lines = ['{:<24} {:>8} {:>10} {:>12}'.format('stage', 'calls', 'seconds', 'bytes')]
+    for name, (calls, seconds, nbytes) in sorted(self.stages.items(),
+                                                 key=lambda s: -s[1][1]):
+      lines.append('{:<24} {:>8} {:>10.3f} {:>12}'.format(name, calls, seconds, nbytes))
+    if self.registers:
+      lines.append('')
+      lines.append('{:<36} {:>10} {:>12}'.format('slowest registers', 'seconds', 'bytes'))
+      for name, (seconds, nbytes) in sorted(self.registers.items(),
+                                            key=lambda r: -r[1][0])[:top]:
+        lines.append('{:<36} {:>10.4f} {:>12}'.format(name, seconds, nbytes))
+    return '\n'.join(lines)
+
+  def dump(self, f):
+    json.dump(self.data(), f, indent=2, sort_keys=True)
@@ -0,0 +1,20 @@
+import sys
+import threading
+
+class Progress:
+  """Count of registers lexed so far, redrawn in place on one line.
+  """
+  def __init__(self, name, total, f=sys.stderr):
+    self.name = name
+    self.total = total
+    self.done = 0
+    self.f = f
+    self.lock = threading.Lock()
+
+  def step(self):
+    with self.lock:
+      self.done += 1
+      self.f.write('\r{}: {}/{} registers'.format(self.name, self.done, self.total))
+      if self.done == self.total:
+        self.f.write('\n')
+      self.f.flush()
@@ -0,0 +1,51 @@
+import unittest
+from pdftoregs.bench import synthetic
+import pdftoregs.common.batch as uut
+
+class TestBatch(unittest.TestCase):
+  def device(self, name, settings, batch):
+    if settings.get('fail'):
+      raise RuntimeError('no such manual')
+    return synthetic.device([('UART', [('CTL', 0x1000, 0, 12, [('EN', (0, 0), 0)])])],
+                            name)
+
+  def test_summaries(self):
+    devices = [('A', { 'RegisterExceptions' : ['X'] }),
+               ('B', { 'RegisterExceptions' : [], 'fail' : True })]
+    with uut.Batch(2) as batch:
+      summaries = batch.run(devices, self.device)
+    self.assertEqual([summary.name for summary in summaries], ['A', 'B'])
+    self.assertEqual(summaries[0].row()[1:5], [1, 1, 1, 1])
+    self.assertTrue(summaries[0].ok)
+    self.assertFalse(summaries[1].ok)
+    table = uut.Summary.table(summaries).splitlines()
+    self.assertEqual(len(table), 3)
+    self.assertTrue(table[2].endswith('failed: no such manual'))
+
+  def test_shared_store_loaded_up_front(self):
+    def settings(pdf):
+      return { 'RegisterExceptions' : [], 'PdfToTextBin' : 'pdftotext',
+               'PdfFname' : pdf, 'CacheDir' : 'cache', 'TextBackend' : 'pdftotext',
+               'TextStore' : 'memory' }
+    options = {}
+    def device(name, settings, batch, stream, lookahead, cache):
+      options[name] = (stream, lookahead)
+    devices = [('A', settings('manual.pdf')),
+               ('B', settings('./manual.pdf')),
+               ('C', settings('other.pdf'))]
+    with uut.Batch(1) as batch:
+      batch.run(devices, device, stream=False, lookahead=2, cache=False)
+      self.assertEqual(options, { 'A' : (False, 0), 'B' : (False, 0), 'C' : (False, 2) })
+      batch.run(devices, device, stream=True, lookahead=0, cache=True)
+      self.assertEqual(options, { 'A' : (False, 0), 'B' : (False, 0), 'C' : (True, 0) })
+
+  def test_shared_page_store(self):
+    with uut.Batch(1) as batch:
+      a = batch.page_store('pdftotext', 'manual.pdf', None)
+      b = batch.page_store('pdftotext', './manual.pdf', None)
+      c = batch.page_store('pdftotext', 'other.pdf', None)
+    self.assertIs(a, b)
+    self.assertIsNot(a, c)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,29 @@
+import os
+import stat
+import tempfile
+import unittest
+import pdftoregs.common.files as uut
+
+class TestAtomicWrite(unittest.TestCase):
+  def test_permissions(self):
+    with tempfile.TemporaryDirectory() as directory:
+      fname = os.path.join(directory, 'out.hpp')
+      uut.write_atomic(fname, b'a')
+      self.assertEqual(stat.S_IMODE(os.stat(fname).st_mode), 0o666 & ~uut._umask)
+      os.chmod(fname, 0o640)
+      uut.write_atomic(fname, b'b')
+      self.assertEqual(stat.S_IMODE(os.stat(fname).st_mode), 0o640)
+      with open(fname, 'rb') as f:
+        self.assertEqual(f.read(), b'b')
+
+  def test_failed_write(self):
+    with tempfile.TemporaryDirectory() as directory:
+      fname = os.path.join(directory, 'out.hpp')
+      with self.assertRaises(RuntimeError):
+        with uut.atomic_write(fname) as f:
+          f.write(b'partial')
+          raise RuntimeError
+      self.assertEqual(os.listdir(directory), [])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from pdftoregs.bench import synthetic
+from pdftoregs.lex import lex
+from pdftoregs.lex.cache import TextCache
+from pdftoregs.lex.columns import Words
+from pdftoregs.lex.pages import PageStore
+from pdftoregs.parse import parse
+from pdftoregs.parse.translators.translator import BaseTranslator
+import pdftoregs.common.manifest as uut
+
+class ManualBackend:
+  """Text and words of a synthetic manual, recording each extraction.
+  """
+  def __init__(self, manual):
+    self.manual = manual
+    self.calls = []
+
+  def identity(self):
+    return ('synthetic',)
+
+  def extract(self, first, last):
+    self.calls.append(('text', first, last))
+    return [self.manual.pages.get(n, '') for n in range(first, last + 1)]
+
+  def words(self, first, last):
+    self.calls.append(('words', first, last))
+    return [Words.from_layout(self.manual.pages.get(n, '')) for n in range(first, last + 1)]
+
+class TestManifest(unittest.TestCase):
+  def setUp(self):
+    tmp = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp.cleanup)
+    self.params = { 'OutputDir' : tmp.name, 'ExcludePeriphs' : [] }
+    self.auto = os.path.join(tmp.name, 'auto')
+    self.manual = synthetic.Manual(3, 4, 4, prose=1)
+
+  def run_manifest(self, pages=None, engine='regex'):
+    """Lex and emit the manual as __main__ does, returning the
+    peripherals lexed and the outputs written.
+    """
+    regexes = synthetic.regexes()
+    manifest = uut.Manifest(os.path.join(self.params['OutputDir'], 'dev.manifest.json'),
+                            BaseTranslator.new('cpp'), self.params, regexes, 2, engine)
+    if pages is None:
+      pages = self.manual.page_store(2)
+    lexer = lex.LexPDF('dev', None, None, regexes, [], pages=pages, engine=engine)
+    entries = lexer.build_toc(self.manual.end_of_toc, 2, {})
+    lexer.load_pages(entries)
+    entries = manifest.select(lexer, entries)
+    lexer.lex_entries(entries)
+    # outputs are only rewritten when their text changed, so zeroing
+    # their mtimes shows which were
+    for fname in os.listdir(self.auto) if os.path.isdir(self.auto) else []:
+      os.utime(os.path.join(self.auto, fname), ns=(0, 0))
+    parse.CodeGenerator('cpp', lexer.toc.t.root, self.params)
+    manifest.save()
+    written = sorted(fname for fname in os.listdir(self.auto)
+                     if os.stat(os.path.join(self.auto, fname)).st_mtime_ns)
+    return sorted({entry.parent.value.name for entry in entries}), written
+
+  def test_only_changes_regenerated(self):
+    lexed, written = self.run_manifest()
+    self.assertEqual(lexed, ['P0', 'P1', 'P2'])
+    self.assertEqual(len(written), 6)
+    self.assertEqual(self.run_manifest(), ([], []))
+
+    # the last page of P1, which only its own tables' windows reach
+    n = self.manual.end_of_toc + 8
+    self.assertIn('P1R3', self.manual.pages[n])
+    self.manual.pages[n] = self.manual.pages[n].replace(' F1 ', ' G1 ')
+    self.assertEqual(self.run_manifest(), (['P1'], ['P1_regs.hpp']))
+    with open(os.path.join(self.auto, 'P1_regs.hpp')) as f:
+      self.assertIn('G1', f.read())
+
+    os.remove(os.path.join(self.auto, 'P2_regs.cpp'))
+    self.assertEqual(self.run_manifest(), (['P2'], ['P2_regs.cpp']))
+    self.assertEqual(self.run_manifest(), ([], []))
+
+  def test_columns_extractions(self):
+    # words are fingerprinted as lexed, and cached, so an up to date run
+    # extracts nothing
+    pdf = os.path.join(self.params['OutputDir'], 'manual.pdf')
+    with open(pdf, 'w') as f:
+      f.write('synthetic')
+    cache = TextCache(os.path.join(self.params['OutputDir'], 'cache'), 1 << 20)
+    def run():
+      backend = ManualBackend(self.manual)
+      result = self.run_manifest(PageStore(None, pdf, cache, backend), 'columns')
+      return result, backend.calls
+    e = self.manual.end_of_toc
+    (lexed, written), calls = run()
+    self.assertEqual((lexed, len(written)), (['P0', 'P1', 'P2'], 6))
+    self.assertEqual(calls, [('text', 1, e), ('words', e + 1, self.manual.last_page + 2)])
+    self.assertEqual(run(), (([], []), []))
+
+    # a new edition of the PDF, changing one page of P1
+    with open(pdf, 'w') as f:
+      f.write('synthetic, revised')
+    n = e + 8
+    self.manual.pages[n] = self.manual.pages[n].replace(' F1 ', ' G1 ')
+    (lexed, written), calls = run()
+    self.assertEqual((lexed, written), (['P1'], ['P1_regs.hpp']))
+    self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import pdftoregs.common.profiling as uut
+
+class TestProfiling(unittest.TestCase):
+  def test_disabled(self):
+    f = lambda x: x
+    self.assertIs(uut.timed('f', f), f)
+    with uut.stage('s') as stage:
+      stage.bytes = 10
+    self.assertIsNone(uut.active())
+
+  def test_collect_and_merge(self):
+    profiler = uut.Profiler()
+    with uut.enabled(profiler):
+      with uut.stage('get_text') as stage:
+        stage.bytes = 100
+      # a worker collects separately and sends back its data
+      with uut.collecting() as worker:
+        uut.timed('feed', len)('abc')
+        uut.timed('feed', len)('de')
+        worker.register('dev', 'CTL', 0.5, 20)
+      self.assertIs(uut.active(), profiler)
+      profiler.merge(worker.data())
+    self.assertIsNone(uut.active())
+    data = profiler.data()
+    self.assertEqual(data['stages']['get_text']['bytes'], 100)
+    self.assertEqual(data['stages']['feed']['calls'], 2)
+    self.assertEqual(data['registers'], { 'dev/CTL' : { 'seconds' : 0.5, 'bytes' : 20 } })
+    self.assertIn('dev/CTL', profiler.report())
+
+if __name__ == '__main__':
+  unittest.main()
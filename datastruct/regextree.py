@@ -1,14 +1,218 @@
+import functools
 import re
 from ..datastruct.tree import Tree
+from ..common import profiling
+
+try:
+  from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+  import sre_parse, sre_constants
+
+_c = sre_constants
+_repeats = {getattr(_c, op)
+            for op in ['MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT']
+            if hasattr(_c, op)}
+_categories = { _c.CATEGORY_DIGIT     : r'\d',
+                _c.CATEGORY_NOT_DIGIT : r'\D',
+                _c.CATEGORY_SPACE     : r'\s',
+                _c.CATEGORY_NOT_SPACE : r'\S',
+                _c.CATEGORY_WORD      : r'\w',
+                _c.CATEGORY_NOT_WORD  : r'\W',
+              }
+
+def _render_class(items):
+  out = []
+  for op, av in items:
+    if op is _c.NEGATE and not out:
+      out.append('^')
+    elif op is _c.LITERAL:
+      out.append(re.escape(chr(av)))
+    elif op is _c.RANGE:
+      out.append('{}-{}'.format(re.escape(chr(av[0])), re.escape(chr(av[1]))))
+    elif op is _c.CATEGORY and av in _categories:
+      out.append(_categories[av])
+    else:
+      return None
+  return '[' + ''.join(out) + ']'
+
+def _render_char(op, av):
+  """Regex source for a single-character item, or None.
+  """
+  if op is _c.LITERAL:
+    return re.escape(chr(av))
+  if op is _c.NOT_LITERAL:
+    return '[^{}]'.format(re.escape(chr(av)))
+  if op is _c.ANY:
+    return '.'
+  if op is _c.IN:
+    return _render_class(av)
+  return None
+
+def _required_runs(items, runs, run):
+  """Split a parsed pattern into runs of single-character items that any
+  match must contain contiguously. Each run is a list of regex sources.
+  """
+  def flush():
+    if run:
+      runs.append(list(run))
+      run.clear()
+  for op, av in items:
+    char = _render_char(op, av)
+    if char is not None:
+      run.append(char)
+    elif op is _c.SUBPATTERN and not av[1] and not av[2]:
+      # a group is contiguous with what surrounds it
+      _required_runs(av[3], runs, run)
+    elif op in _repeats and av[0] >= 1 and len(av[2]) == 1:
+      lo, hi, ((sub_op, sub_av),) = av
+      char = _render_char(sub_op, sub_av)
+      if char is None:
+        flush()
+        continue
+      run.extend([char] * lo)
+      if hi != lo:
+        flush()
+        run.extend([char] * lo)
+    else:
+      flush()
+  return runs
+
+def _anchored(parsed, flags):
+  return (len(parsed) > 0 and
+          (parsed[0] == (_c.AT, _c.AT_BEGINNING_STRING) or
+           parsed[0] == (_c.AT, _c.AT_BEGINNING) and not flags & re.MULTILINE))
+
+def _flatten(items):
+  for op, av in items:
+    if op is _c.SUBPATTERN and not av[1] and not av[2]:
+      yield from _flatten(av[3])
+    else:
+      yield op, av
+
+def _head(items):
+  """Regex sources for the leading single-character items of an anchored
+  pattern, up to the first variable-length repeat after a required item.
+  """
+  out = []
+  required = False
+  for op, av in _flatten(items):
+    char = _render_char(op, av)
+    if char is not None:
+      out.append(char)
+      required = True
+      continue
+    if op is _c.MAX_REPEAT and len(av[2]) == 1:
+      lo, hi, ((sub_op, sub_av),) = av
+      char = _render_char(sub_op, sub_av)
+      if char is not None and not (required and lo != hi):
+        out.append('{}{{{},{}}}'.format(char, lo,
+                                        '' if hi == _c.MAXREPEAT else hi))
+        required = required or lo > 0
+        continue
+    break
+  return out if required else []
+
+@functools.lru_cache(maxsize=None)
+def prefilter(pattern):
+  r"""Regex source for a cheap pattern that every line matched by pattern
+  also matches, or None.
+
+  For a pattern anchored at the start of the line this is its leading
+  run of single characters, e.g. ^\s*Table. Otherwise it is the longest
+  run of single characters the pattern requires contiguously, e.g.
+  [0-9a-fA-F]{4}h for a register offset. Neither ever backtracks far.
+  """
+  if not isinstance(pattern.pattern, str):
+    return None
+  flags = pattern.flags & ~re.VERBOSE
+  parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+  if _anchored(parsed, flags):
+    head = _head(parsed[1:])
+    return '^' + ''.join(head) if head else None
+  runs = _required_runs(parsed, [], [])
+  if not runs:
+    return None
+  best = max(runs, key=len)
+  if len(best) < 2:
+    return None
+  return ''.join(best)
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern):
+  """re.compile, remembered for the run so trees built per register
+  share their patterns without going through re's own cache.
+  """
+  return re.compile(pattern)
+
+class LineClassifier:
+  """Decide which levels of a RegexTree a line matches.
+
+  Most lines of a manual match no level at all. The prefilters of all
+  levels are joined into one alternation, so candidates() rejects such
+  lines with a single regex search that never backtracks far, without
+  calling back into Python per line. Lines that pass are searched level
+  by level, so the matches found are exactly those of every pattern.
+
+  A classifier holds no state of its own, so get() hands out one per
+  combination of patterns for the whole run.
+  """
+  @classmethod
+  @functools.lru_cache(maxsize=None)
+  def get(cls, patterns):
+    return cls(patterns)
+
+  def __init__(self, patterns):
+    levels = []
+    for level, pattern in enumerate(patterns):
+      # an unanchored search is costly enough to be worth guarding
+      source = prefilter(pattern)
+      if source is None or source.startswith('^'):
+        guard = None
+      else:
+        guard = re.compile(source, pattern.flags & ~re.VERBOSE).search
+      levels.append((level, pattern.search, guard))
+    # levels to try at each depth, so matches() need not slice
+    self.active = [levels[:depth+1] for depth in range(len(levels))]
+    self.candidate = self.guard(patterns)
+
+  @staticmethod
+  def guard(patterns):
+    """Search function true for every line some pattern matches, or None.
+    """
+    flags = {pattern.flags & ~re.VERBOSE for pattern in patterns}
+    sources = [prefilter(pattern) for pattern in patterns]
+    if len(flags) != 1 or None in sources:
+      return None
+    return re.compile('|'.join('(?:{})'.format(source) for source in sources),
+                      flags.pop()).search
+
+  def candidates(self, lines):
+    """Drop lines that no level can match.
+    """
+    if self.candidate is None:
+      return lines
+    return filter(self.candidate, lines)
+
+  def matches(self, line, depth):
+    """List (level, match) for each of levels 0..depth matching line.
+    """
+    found = []
+    for level, search, guard in self.active[min(depth, len(self.active) - 1)]:
+      if guard is None or guard(line):
+        m = search(line)
+        if m:
+          found.append((level, m))
+    return found
 
 class RegexTree:
   @staticmethod
   def compile_pair(levelpair):
     pattern, other = levelpair
-    return (re.compile(pattern), other)
+    return (compile_pattern(pattern), other)
 
   def __init__(self, name, levels):
     self.levels = list(map(self.compile_pair, levels))
+    self.classifier = LineClassifier.get(tuple(pattern for pattern, _ in self.levels))
     self.depth = 0
     self.ctx = None
     self.proceed = True
@@ -25,22 +229,28 @@ class RegexTree:
       return True
 
   def feed(self, line):
-    for depth, (pattern, factory) in enumerate(self.levels[:self.depth+1]):
-      m = pattern.search(line)
-      if m:
-        if depth < self.depth:
-          self._t = self._t.ascend(self.depth - depth)
-          self.depth = depth + 1
-        else:
-          self.depth += 1
-        new = factory(self.ctx, m)
-        try:
-          self.ctx, node = new
-        except TypeError:
-          self.ctx, node = None, new
-        if node != None:
-          self._t = self._t.add(node)
+    for depth, m in self.classifier.matches(line, self.depth):
+      factory = self.levels[depth][1]
+      if depth < self.depth:
+        self._t = self._t.ascend(self.depth - depth)
+        self.depth = depth + 1
+      else:
+        self.depth += 1
+      new = factory(self.ctx, m)
+      try:
+        self.ctx, node = new
+      except TypeError:
+        self.ctx, node = None, new
+      if node != None:
+        self._t = self._t.add(node)
 
   def build(self, text):
-    for line in iter(text.splitlines()):
-      self.feed(line)
+    """Feed a whole text, or an iterable of lines as they arrive,
+    stopping early if a factory clears proceed.
+    """
+    lines = text.splitlines() if isinstance(text, str) else text
+    feed = profiling.timed('RegexTree.feed', self.feed)
+    for line in self.classifier.candidates(lines):
+      feed(line)
+      if not self.proceed:
+        break
@@ -0,0 +1,64 @@
+import configparser
+import os
+import re
+import unittest
+import pdftoregs
+import pdftoregs.datastruct.regextree as uut
+
+class TestLineClassifier(unittest.TestCase):
+  lines = ['1     System Control (SYS) ........ 20',
+           '1.2   Clock Generator ............. 31',
+           '   1.1.3   Clock Register (CCR2) [offset = 1C1Fh] [reset = 0000h] ....... 22',
+           '   4.4.1   Idle Configuration Register (ICR) (word address = 0001h) ..... 80',
+           '   Figure 1-2. Timing diagram .................... 14',
+           'Table 1-24. Clock Configuration Register 2 (CCR2) Field Descriptions',
+           '  Table 5-3. Interrupt Enable Register (IER) Bit Field Descriptions',
+           '  15-8   RATE      R/W    0h     sample rate',
+           '   7     Reserved. R      0      Reserved',
+           '  3[1:0] MODE[1:0] R/W    3h     mode',
+           '   The CCR2 register is described in Section 4.2. See Table 1-2.',
+           '',
+           ' \f ',
+          ]
+
+  @classmethod
+  def setUpClass(cls):
+    cfg = configparser.ConfigParser()
+    cfg.read(os.path.join(os.path.dirname(pdftoregs.__file__), 'scanpdf.cfg'))
+    section = cfg['TI_TMS320C5517']
+    cls.patterns = [re.compile(section[k + 'Regex'], re.VERBOSE)
+                    for k in ['Section',
+                              'Register',
+                              'BitfieldHeader',
+                              'BitfieldLine',
+                             ]]
+
+  def assertSameMatches(self, patterns, lines):
+    classifier = uut.LineClassifier(patterns)
+    candidates = list(classifier.candidates(lines))
+    for line in lines:
+      for depth in range(len(patterns)):
+        expected = [(level, pattern.search(line).span())
+                    for level, pattern in enumerate(patterns[:depth+1])
+                    if pattern.search(line)]
+        found = [(level, m.span())
+                 for level, m in classifier.matches(line, depth)]
+        self.assertEqual(found, expected, line)
+        if expected:
+          self.assertIn(line, candidates)
+
+  def test_cfg_patterns(self):
+    self.assertSameMatches(self.patterns[:2], self.lines)
+    self.assertSameMatches(self.patterns[2:], self.lines)
+    self.assertEqual(uut.prefilter(self.patterns[2]), r'^[\s]{0,}Table')
+
+  def test_unguarded_patterns(self):
+    patterns = [re.compile(r'(?i)table'),
+                re.compile(r'^\s*(ab|cd)e'),
+                re.compile(r'x?y')]
+    for pattern in patterns:
+      self.assertIsNone(uut.prefilter(pattern))
+    self.assertSameMatches(patterns, ['TABLE', ' abe', 'y', 'zzz'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,13 +1,16 @@
 import unittest
-import collections
+import collections.abc
+import contextlib
+import io
 import itertools
+import sys
 import pdftoregs.datastruct.tree as uut
 
 class TestTree(unittest.TestCase):
   @classmethod
   def flatten(cls, iterable):
     for i in iterable:
-      if isinstance(i, collections.Iterable) and not isinstance(i, (str, bytes)):
+      if isinstance(i, collections.abc.Iterable) and not isinstance(i, (str, bytes)):
         for j in cls.flatten(i):
           yield j
       else:
@@ -51,5 +54,59 @@ class TestTree(unittest.TestCase):
                            '|   |   |   +-- leafD',
                           '']))
 
+  def test_render(self):
+    t = uut.Tree(['root', ['left', ['leafA', []]], ['right', []]])
+    f = io.StringIO()
+    t.render(f)
+    self.assertEqual(f.getvalue(), str(t))
+
+  def test_deep_tree(self):
+    depth = sys.getrecursionlimit() + 100
+    t = node = uut.Tree(['n0'])
+    for i in range(1, depth):
+      node = node.add('n{}'.format(i))
+    self.assertEqual([n.value for n in t], ['n{}'.format(i) for i in range(depth)])
+    self.assertEqual(str(t).count('\n'), depth)
+    seen = []
+    t.walk(None, lambda ctx, value: contextlib.nullcontext(seen.append(value)))
+    self.assertEqual(len(seen), depth)
+
+  def test_walk_exceptions(self):
+    t = uut.Tree(['root', ['a', ['a1', []], ['a2', []]], ['b', []]])
+    log = []
+
+    @contextlib.contextmanager
+    def visit(value, suppress_at):
+      log.append('enter ' + value)
+      try:
+        if value == 'a1':
+          raise KeyError(value)
+        yield
+      except KeyError:
+        log.append('caught at ' + value)
+        if value != suppress_at:
+          raise
+      finally:
+        log.append('exit ' + value)
+
+    def operation(suppress_at):
+      return lambda ctx, value: (visit(value, suppress_at)
+                                 if isinstance(value, str) else None)
+
+    t.walk(None, operation('a'))
+    # a suppresses the error, so a2 is skipped but b is still visited
+    self.assertEqual(log, ['enter root', 'enter a', 'enter a1',
+                           'caught at a1', 'exit a1',
+                           'caught at a', 'exit a',
+                           'enter b', 'exit b', 'exit root'])
+
+    log.clear()
+    with self.assertRaises(KeyError):
+      t.walk(None, operation(None))
+    self.assertEqual(log, ['enter root', 'enter a', 'enter a1',
+                           'caught at a1', 'exit a1',
+                           'caught at a', 'exit a',
+                           'caught at root', 'exit root'])
+
 if __name__ == '__main__':
   unittest.main()
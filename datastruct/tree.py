@@ -1,16 +1,26 @@
-import collections
 import copy
 import functools
+import types
 
 class Tree:
+  """Ordered tree of values, keyed by their string form.
+
+  Nodes are slotted and leaves share one read-only children mapping
+  until a child is added, since register trees hold tens of thousands
+  of bitfield leaves.
+  """
+  __slots__ = ('parent', 'depth', '_value', 'key', 'children', '_iterator')
+
   class _Leaf:
     def __str__(self):
       return 'nil'
   _leaf = _Leaf()
+  _no_children = types.MappingProxyType({})
 
   def __init__(self, nodes=None):
     self.parent = None
     self.depth = 0
+    self._iterator = None
     self.reset()
     if nodes:
       self.value, *children = nodes
@@ -19,8 +29,6 @@ class Tree:
     else:
       self.value = self._leaf
 
-    self.iterator = self.__iter__()
-
   @property
   def value(self):
     return self._value
@@ -35,16 +43,21 @@ class Tree:
   #
   def show_branch(self, depth=0):
     return ('|   '*depth + '+-- ' + str(self.value) + '\n')
-  def __str__(self, depth=0):
-    if self.value == self._leaf:
+  def render(self, f):
+    """Write the tree to a file as str() shows it, one line at a time.
+    """
+    if self.value is self._leaf:
+      return
+    for node, depth in self._preorder():
+      f.write(node.show_branch(depth))
+
+  def __str__(self):
+    if self.value is self._leaf:
       return ''
-    ret = self.show_branch(depth)
-    for c in self.children.values():
-      ret += c.__str__(depth + 1)
-    return ret
+    return ''.join([node.show_branch(depth) for node, depth in self._preorder()])
 
   def to_list(self):
-    if self.value == self._leaf:
+    if self.value is self._leaf:
       return []
     return [self.value] + [x.to_list() for x in self.children.values()]
 
@@ -65,14 +78,14 @@ class Tree:
   def add(self, child):
     t = Tree()
     t.value = child
-    t.parent = self
-    t.depth = self.depth + 1
-    self.children[t.key] = t
+    self.add_tree(t)
     return t
 
   def add_tree(self, child):
     child.parent = self
     child.depth = self.depth + 1
+    if self.children is self._no_children:
+      self.children = {}
     self.children[child.key] = child
 
   def prune(self, depth, threshold=1):
@@ -86,32 +99,88 @@ class Tree:
         c.prune(depth, threshold)
 
   def reset(self):
-    self.children = collections.OrderedDict()
+    self.children = self._no_children
 
   ###
   # Navigation
   #
+  def _preorder(self):
+    """Yield (node, depth below self) for every node holding a value,
+    depth first, with an explicit stack rather than nested generators.
+    Subtrees under leaf markers are not entered.
+    """
+    leaf = self._leaf
+    if self._value is not leaf:
+      yield self, 0
+    stack = [iter(self.children.values())]
+    while stack:
+      for child in stack[-1]:
+        if child._value is not leaf:
+          yield child, len(stack)
+          if child.children:
+            stack.append(iter(child.children.values()))
+            break
+      else:
+        stack.pop()
+
   def __iter__(self):
-    """Breadth-first traversal.
+    """Depth-first, pre-order traversal.
     """
-    if self.value != self._leaf:
-      yield self
-    for child in self.children.values():
-      if child.value != child._leaf:
-        for x in iter(child):
-          yield x
+    for node, _ in self._preorder():
+      yield node
 
   def __next__(self):
+    if self._iterator is None:
+      self._iterator = iter(self)
     try:
-      return next(self.iterator)
+      return next(self._iterator)
     except StopIteration:
-      self.iterator = iter(self)
+      self._iterator = None
       raise
 
   def walk(self, ctx, operation):
-    with operation(ctx, self.value) as new_ctx:
-      for child in self.children.values():
-        child.walk(new_ctx, operation)
+    """Apply operation to every value, nesting the context managers
+    it returns. A subtree is skipped if operation returns None.
+
+    Behaves as nested with statements would, exceptions included, but
+    keeps the open managers on an explicit stack instead of recursing.
+    """
+    manager = operation(ctx, self.value)
+    if manager is None:
+      return
+    stack = [(manager, manager.__enter__(), iter(self.children.values()))]
+    while stack:
+      try:
+        while stack:
+          manager, ctx, children = stack[-1]
+          for child in children:
+            child_manager = operation(ctx, child.value)
+            if child_manager is None:
+              continue
+            child_ctx = child_manager.__enter__()
+            if child.children:
+              stack.append((child_manager, child_ctx,
+                            iter(child.children.values())))
+              break
+            child_manager.__exit__(None, None, None)
+          else:
+            stack.pop()
+            manager.__exit__(None, None, None)
+      except BaseException as e:
+        self._unwind(stack, e)
+
+  @staticmethod
+  def _unwind(stack, exc):
+    # hand exc to the open managers, innermost first, until one
+    # suppresses it; whatever is left propagates
+    while stack:
+      manager, _, _ = stack.pop()
+      try:
+        if manager.__exit__(type(exc), exc, exc.__traceback__):
+          return
+      except BaseException as e:
+        exc = e
+    raise exc
 
   def ascend(self, k):
     curr = self
@@ -0,0 +1,164 @@
+"""Decoding register dumps into bitfield values, from the lexed model.
+
+A dump is a numpy array of register words indexed by word address, as
+RegisterNode.offset gives it, from some base address. Leading axes are
+free, e.g. one row per board a dump was captured from:
+
+  decoder = DumpDecoder(root, base=0x1000)
+  values = decoder.decode(dumps)           # dumps.shape == (boards, words)
+  values['UART']['IER']['ERBI']            # one value per board
+
+The word index, shift and mask of every field are worked out once, so a
+dump of any size decodes with a few whole-array operations. Fields keep
+their own bits, right-aligned, as the generated bitfield structs do;
+logbits only name them. Needs numpy.
+
+  python -m pdftoregs.decode.dump MODEL DUMP... [--base ADDR]
+
+reads a model saved with --dump-model and reports, for raw dumps of
+16-bit words, which fields differ from their reset values.
+"""
+import argparse
+
+import numpy as np
+
+from .fields import Field, registers
+
+class DumpDecoder:
+  """Decodes dumps of the registers of one device tree.
+
+  Fields of every register are laid out one after another in arrays of
+  the word index, shift, mask and reset of each, so decoding gathers,
+  shifts and masks all fields at once. The result is viewed as a nested
+  structured array, peripheral, register then field, without copying.
+  A register named like one before it in its peripheral, as one
+  described on two pages may be, is named NAME@OFFSET.
+  """
+  def __init__(self, root, base=0, reserved=False, peripherals=None):
+    self.base = base
+    self.names = []
+    index, shifts, masks, resets = [], [], [], []
+    layout = {}
+    for peripheral, node in registers(root):
+      if peripherals is not None and peripheral not in peripherals:
+        continue
+      fields = Field.of_register(node, reserved)
+      if not fields:
+        continue
+      register = node.value
+      if register.offset < base:
+        raise ValueError('register {}.{} at {:#x} is below base {:#x}'.format(
+                         peripheral, register.name, register.offset, base))
+      names = layout.setdefault(peripheral, {})
+      name = register.name
+      if name in names:
+        # listed again on another page, so told apart by address
+        name = '{}@{:#x}'.format(name, register.offset)
+      if name in names:
+        raise ValueError('register {}.{} is listed again at {:#x}'.format(
+                         peripheral, register.name, register.offset))
+      names[name] = [f.name for f in fields]
+      for f in fields:
+        self.names.append((peripheral, name, f.name))
+        index.append(register.offset - base)
+        shifts.append(f.shift)
+        masks.append(f.mask)
+        resets.append(f.reset)
+    self.layout = layout
+    self.index = np.array(index, dtype=np.intp)
+    self.shifts = np.array(shifts, dtype=np.uint8)
+    self.masks = np.array(masks, dtype=np.uint64)
+    self.resets = np.array(resets, dtype=np.uint64)
+    self.words = int(self.index.max()) + 1 if index else 0
+
+  def __len__(self):
+    return len(self.names)
+
+  def dtype(self, scalar):
+    """Nested structured dtype of decoded fields of type scalar.
+    """
+    return np.dtype([(peripheral, [(register, [(field, scalar) for field in fields])
+                                   for register, fields in registers.items()])
+                     for peripheral, registers in self.layout.items()])
+
+  def fields(self, dump):
+    """Value of every field, in the order of names, along a new last axis
+    in place of the address axis of dump.
+    """
+    dump = np.asarray(dump)
+    if dump.shape[-1] < self.words:
+      raise ValueError('dump holds {} words from {:#x}, registers reach {:#x}'.format(
+                       dump.shape[-1], self.base, self.base + self.words - 1))
+    if not np.issubdtype(dump.dtype, np.unsignedinteger):
+      raise TypeError('dump words are {}, expected unsigned integers'.format(dump.dtype))
+    # unlike indexing, take() lays the fields of each dump out contiguously
+    values = dump.take(self.index, axis=-1)
+    values >>= self.shifts.astype(dump.dtype)
+    values &= self.masks.astype(dump.dtype)
+    return values
+
+  def decode(self, dump):
+    """Structured array of every field, of the shape of dump without its
+    address axis.
+    """
+    values = self.fields(dump)
+    return values.view(self.dtype(values.dtype))[..., 0]
+
+  def changed(self, dump):
+    """Like decode(), with whether each field differs from its reset.
+    """
+    differs = self.fields(dump) != self.resets.astype(np.asarray(dump).dtype)
+    return differs.view(self.dtype(np.bool_))[..., 0]
+
+  def differences(self, dump):
+    """(peripheral, register, field, reset, count, values) of each field
+    differing from its reset in any of the dumps: how many it differs in
+    and the distinct values it takes there.
+    """
+    values = self.fields(dump).reshape(-1, len(self))
+    resets = self.resets.astype(values.dtype)
+    counts = np.count_nonzero(values != resets, axis=0)
+    differing = np.flatnonzero(counts)
+    # a field at a time, so its values are contiguous
+    columns = np.ascontiguousarray(values[:, differing].T)
+    for i, column in zip(differing, columns):
+      reset = resets[i]
+      if self.masks[i] <= 0xffff:
+        # most fields are narrow, so counting beats sorting for their values
+        seen = np.bincount(column.astype(np.intp), minlength=int(self.masks[i]) + 1)
+        seen[reset] = 0
+        seen = np.flatnonzero(seen)
+      else:
+        seen = np.unique(column[column != reset])
+      yield self.names[i] + (int(reset), int(counts[i]), seen.tolist())
+
+def main():
+  from ..lex import model
+
+  argparser = argparse.ArgumentParser(description='Report fields of register dumps '
+                                                  'that differ from reset.')
+  argparser.add_argument('model', help='model file saved with --dump-model')
+  argparser.add_argument('dumps', nargs='+', metavar='dump',
+                         help='raw 16-bit words, one file per board')
+  argparser.add_argument('--base', type=lambda s: int(s, 0), default=0,
+                         help='word address of the first word of each dump')
+  argparser.add_argument('--big-endian', action='store_true')
+  argparser.add_argument('--peripheral', nargs='+',
+                         help='decode these peripherals only')
+  argparser.add_argument('--reserved', action='store_true',
+                         help='check Reserved fields as well')
+  args = argparser.parse_args()
+
+  with open(args.model) as f:
+    root = model.load(f)
+  decoder = DumpDecoder(root, args.base, args.reserved, args.peripheral)
+  word = np.dtype('>u2' if args.big_endian else '<u2')
+  dumps = np.stack([np.fromfile(fname, dtype=word, count=decoder.words)
+                    .astype(np.uint16) for fname in args.dumps])
+  for peripheral, register, field, reset, count, values in decoder.differences(dumps):
+    print('{}.{}.{}: reset {:#x}, differs in {}/{}: {}'.format(
+          peripheral, register, field, reset, count, len(dumps),
+          ' '.join('{:#x}'.format(v) for v in values)))
+
+if __name__ == '__main__':
+  main()
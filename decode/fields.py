@@ -0,0 +1,41 @@
+"""Where the bitfields of the lexed model sit in their register words.
+"""
+from ..lex.register import PeripheralNode, RegisterNode
+
+def registers(root):
+  """(peripheral name, register node) of each register of a device tree
+  that has bitfields, in order.
+  """
+  peripheral = None
+  for node in root:
+    if isinstance(node.value, PeripheralNode):
+      peripheral = node.value.name
+    elif isinstance(node.value, RegisterNode) and node.children:
+      yield peripheral, node
+
+class Field:
+  """Where one bitfield sits in a register, and its reset value.
+  """
+  __slots__ = ('name', 'shift', 'mask', 'reset')
+
+  def __init__(self, name, physbits, reset):
+    hi, lo = max(physbits), min(physbits)
+    self.name = name
+    self.shift = lo
+    self.mask = (1 << (hi - lo + 1)) - 1
+    self.reset = reset & self.mask
+
+  @classmethod
+  def of_register(cls, node, reserved=False):
+    """Fields of a register tree node, Reserved ones only if reserved.
+
+    Resets come from the bitfield table, unless it gave none, in which
+    case they are taken from the reset of the register.
+    """
+    bitfields = [c.value for c in node.children.values()
+                 if reserved or not c.value.name.startswith('__reserved')]
+    if any(b.reset for b in bitfields):
+      return [cls(b.name, b.physbits, b.reset) for b in bitfields]
+    register_reset = getattr(node.value, 'reset', 0) or 0
+    return [cls(b.name, b.physbits, register_reset >> min(b.physbits))
+            for b in bitfields]
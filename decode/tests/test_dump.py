@@ -0,0 +1,77 @@
+import importlib.util
+import unittest
+from pdftoregs.bench import synthetic
+from pdftoregs.lex import register
+
+if importlib.util.find_spec('numpy'):
+  import numpy as np
+  import pdftoregs.decode.dump as uut
+
+def device():
+  return synthetic.device([
+    ('UART', [('RBR', 0x1b00, 0,      852, [('DATA', (15, 8), 0), ('__reserved0', (7, 0), 0)]),
+              ('IER', 0x1b02, 0x0005, 852, [('ETBEI', (1, 1), 0), ('ERBI', (0, 0), 0),
+                                            ('MODE', (7, 4), 0)]),
+              ('FCR', 0x1b03, 0,      852, [('TRIG', (7, 6), 2), ('EN', (0, 0), 1)])])])
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+class TestDumpDecoder(unittest.TestCase):
+  def setUp(self):
+    self.decoder = uut.DumpDecoder(device(), base=0x1b00)
+    self.dumps = np.array([[0xab12, 0, 0x0005, 0x0081],
+                           [0x0000, 0, 0x0036, 0x00c1]], dtype=np.uint16)
+
+  def test_decode(self):
+    values = self.decoder.decode(self.dumps)
+    self.assertEqual(values.shape, (2,))
+    self.assertEqual(values['UART']['RBR'].dtype.names, ('DATA',))
+    self.assertEqual(values['UART']['RBR']['DATA'].tolist(), [0xab, 0])
+    self.assertEqual(values['UART']['IER'][1].tolist(), (1, 0, 3))
+    self.assertEqual(values['UART']['FCR']['TRIG'].tolist(), [2, 3])
+
+  def test_differences(self):
+    # IER resets from the register, as its table gives no resets
+    self.assertEqual(list(self.decoder.differences(self.dumps)),
+                     [('UART', 'RBR', 'DATA',  0, 1, [0xab]),
+                      ('UART', 'IER', 'ETBEI', 0, 1, [1]),
+                      ('UART', 'IER', 'ERBI',  1, 1, [0]),
+                      ('UART', 'IER', 'MODE',  0, 1, [3]),
+                      ('UART', 'FCR', 'TRIG',  2, 1, [3])])
+    self.assertFalse(self.decoder.changed(self.dumps[0])['UART']['FCR']['EN'])
+
+  def test_lexed_resets(self):
+    # resets as the BitfieldLineRegex of scanpdf.cfg reads them
+    root = synthetic.device([('UART', [('LCR', 0x1b00, 0, 852, [])])])
+    regexes = synthetic.regexes()
+    table = register.BitfieldTree('LCR', ['Table 1-3. Line Control Register (LCR) Field Descriptions',
+                                          '  Bit    Field     Type   Reset  Description',
+                                          '  15-8   Reserved  R      0      Reserved',
+                                          '  7-2    DIV       R/W    1Ah    divider',
+                                          '  1-0    WLS       R/W    3h     word length'],
+                                  regexes['BitfieldHeader'], regexes['BitfieldLine'])
+    node, = [n for n in root if isinstance(n.value, register.RegisterNode)]
+    for field in table:
+      node.add(field.value)
+    decoder = uut.DumpDecoder(root, base=0x1b00)
+    self.assertEqual(decoder.resets.tolist(), [0x1a, 3])
+    self.assertEqual(list(decoder.differences(np.array([[0x6b]], dtype=np.uint16))), [])
+
+  def test_same_name_twice(self):
+    root = synthetic.device([('UART', [('RBR', 0x1b00, 0, 852, [('DATA', (7, 0), 0)]),
+                                       ('RBR', 0x1b08, 0, 860, [('DATA', (7, 0), 0)])])])
+    decoder = uut.DumpDecoder(root, base=0x1b00)
+    self.assertEqual(decoder.names, [('UART', 'RBR', 'DATA'), ('UART', 'RBR@0x1b08', 'DATA')])
+    values = decoder.decode(np.arange(9, dtype=np.uint16))
+    self.assertEqual((values['UART']['RBR']['DATA'], values['UART']['RBR@0x1b08']['DATA']),
+                     (0, 8))
+    root = synthetic.device([('UART', [('RBR', 0x1b00, 0, page, [('DATA', (7, 0), 0)])
+                                       for page in [852, 860, 870]])])
+    with self.assertRaises(ValueError):
+      uut.DumpDecoder(root, base=0x1b00)
+
+  def test_short_dump(self):
+    with self.assertRaises(ValueError):
+      self.decoder.decode(self.dumps[:, :3])
+
+if __name__ == '__main__':
+  unittest.main()
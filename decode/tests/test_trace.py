@@ -0,0 +1,64 @@
+import io
+import struct
+import unittest
+from pdftoregs.bench import synthetic
+import pdftoregs.decode.trace as uut
+
+class TestTraceDecoder(unittest.TestCase):
+  @staticmethod
+  def device():
+    return synthetic.device([
+      ('UART', [('RBR', 0x1b00, 0, 1, [('DATA', (7, 0), 0)]),
+                ('THR', 0x1b00, 0, 1, [('DATA', (7, 0), 0)]),
+                ('IER', 0x1b02, 0, 1, [('MODE', (7, 4), 2), ('ERBI', (0, 0), 1)])]),
+      ('GPIO', [('DIR', 0x1c00, 0, 1, [('DIR', (15, 0), 0)])])])
+
+  def setUp(self):
+    self.index = uut.AddressIndex(self.device())
+
+  def test_lookup(self):
+    self.assertEqual([r.name for r in self.index.lookup(0x1b00)], ['RBR', 'THR'])
+    self.assertEqual([r.name for r in self.index.lookup(0x1c00)], ['DIR'])
+    for address in [0, 0x1b01, 0x1c01]:
+      self.assertIsNone(self.index.lookup(address))
+
+  def test_csv(self):
+    trace = io.StringIO('address,value,timestamp\n'
+                        '0x1b02,0x30,10\n'
+                        '0x1b02,0x30,11\n'
+                        '0x1b01,0xff,12\n'
+                        '\n'
+                        '7168,5,12.5\n')
+    decoder = uut.TraceDecoder(self.index)
+    # IER resets to MODE 2, ERBI 1
+    self.assertEqual([str(c) for c in decoder.decode(uut.read_csv(trace, chunk=16))],
+                     ['10 UART.IER.MODE 0x2 -> 0x3',
+                      '10 UART.IER.ERBI 0x1 -> 0x0',
+                      '12.5 GPIO.DIR.DIR 0x0 -> 0x5'])
+    self.assertEqual((decoder.records, decoder.unmapped), (4, 1))
+
+  def test_csv_errors(self):
+    for text, line in [('0x1b02,0x30,10\n0x1b02,0x30\n', 2),
+                       ('0x1b02;0x30;10\n', 1),
+                       ('address,value,timestamp\n\n0x1b02,0x30,10,1\n', 3),
+                       ('address,value,timestamp\n0x1b02,bad,10\n', 2)]:
+      with self.assertRaisesRegex(ValueError, '^line {}:'.format(line)):
+        list(uut.read_csv(io.StringIO(text)))
+
+  def test_binary(self):
+    record = struct.Struct('<IIQ')
+    data = b''.join(record.pack(*r) for r in [(0x1b00, 0x41, 1),
+                                              (0x1c00, 0x8000, 2),
+                                              (0x1c00, 0x8001, 3)])
+    decoder = uut.TraceDecoder(self.index)
+    changes = [(c.timestamp, c.peripheral, c.register, c.field, c.old, c.new)
+               for c in decoder.decode(uut.read_binary(io.BytesIO(data), chunk=20))]
+    self.assertEqual(changes, [(1, 'UART', 'RBR', 'DATA', 0, 0x41),
+                               (1, 'UART', 'THR', 'DATA', 0, 0x41),
+                               (2, 'GPIO', 'DIR', 'DIR', 0, 0x8000),
+                               (3, 'GPIO', 'DIR', 'DIR', 0x8000, 0x8001)])
+    with self.assertRaises(ValueError):
+      list(uut.read_binary(io.BytesIO(data[:-1])))
+
+if __name__ == '__main__':
+  unittest.main()
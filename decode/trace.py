@@ -0,0 +1,234 @@
+"""Decoding bus traces into bitfield changes, from the lexed model.
+
+A trace is a run of (address, value, timestamp) register writes. Each
+write is looked up by address among the registers of the model, compared
+with the last value written there, or its reset before that, and turned
+into one Change per field it changed. Traces are read a chunk at a time
+and decoded as changes are consumed, so memory stays the same however
+long the trace is.
+
+  python -m pdftoregs.decode.trace MODEL TRACE [--binary FORMAT]
+
+reads a model saved with --dump-model and prints the changes of a trace,
+then how many records it decoded per second. CSV traces hold one
+address,value,timestamp line per write, numbers in decimal or 0x hex,
+after an optional header line. Binary traces are packed records of the
+struct FORMAT, holding address, value and timestamp in that order.
+"""
+import argparse
+import bisect
+import logging
+import struct
+import sys
+import time
+
+from .fields import Field, registers
+
+log = logging.getLogger(__name__)
+
+# bytes read from a trace at a time
+CHUNK = 1 << 20
+
+class Register:
+  """A register of the model, as writes to it are decoded.
+  """
+  __slots__ = ('peripheral', 'name', 'offset', 'fields', 'layout', 'reset')
+
+  def __init__(self, peripheral, node, reserved=False):
+    self.peripheral = peripheral
+    self.name = node.value.name
+    self.offset = node.value.offset
+    self.fields = Field.of_register(node, reserved)
+    self.layout = tuple((f.name, f.shift, f.mask) for f in self.fields)
+    self.reset = 0
+    for f in self.fields:
+      self.reset |= f.reset << f.shift
+
+class AddressIndex:
+  """Registers of a device tree by address, across its peripherals.
+
+  Each register spans width addresses from its offset. Their starts are
+  kept sorted, so an address is found by bisecting them. Registers
+  sharing an address, as a receive and a transmit buffer may, are found
+  together.
+  """
+  def __init__(self, root, width=1, reserved=False):
+    self.width = width
+    self.starts = []
+    self.registers = []
+    regs = sorted((Register(peripheral, node, reserved)
+                   for peripheral, node in registers(root)),
+                  key=lambda r: r.offset)
+    for r in regs:
+      if r.fields and self.starts and self.starts[-1] == r.offset:
+        self.registers[-1] += (r,)
+      elif r.fields:
+        self.starts.append(r.offset)
+        self.registers.append((r,))
+
+  def __len__(self):
+    return sum(len(regs) for regs in self.registers)
+
+  def lookup(self, address):
+    """Registers at address, or None.
+    """
+    i = bisect.bisect_right(self.starts, address) - 1
+    if i >= 0 and address < self.starts[i] + self.width:
+      return self.registers[i]
+    return None
+
+class Change:
+  """A field changed by a write.
+  """
+  __slots__ = ('timestamp', 'peripheral', 'register', 'field', 'old', 'new')
+
+  def __init__(self, timestamp, peripheral, register, field, old, new):
+    self.timestamp = timestamp
+    self.peripheral = peripheral
+    self.register = register
+    self.field = field
+    self.old = old
+    self.new = new
+
+  def __str__(self):
+    return '{} {}.{}.{} {:#x} -> {:#x}'.format(self.timestamp, self.peripheral,
+                                              self.register, self.field,
+                                              self.old, self.new)
+
+class TraceDecoder:
+  """Changes made by the writes of a trace, keeping the last value
+  written to each register of index across calls.
+
+  Addresses found in the index are remembered, so the registers of a
+  busy address are not looked up over and over; there are no more of
+  them than registers.
+  """
+  def __init__(self, index):
+    self.index = index
+    self.found = {}
+    self.values = {}
+    self.records = 0
+    self.unmapped = 0
+
+  def decode(self, records):
+    """Changes made by records of (address, value, timestamp), lazily.
+    """
+    lookup = self.index.lookup
+    found = self.found
+    values = self.values
+    for address, value, timestamp in records:
+      self.records += 1
+      regs = found.get(address)
+      if regs is None:
+        regs = lookup(address)
+        if regs is None:
+          self.unmapped += 1
+          continue
+        found[address] = regs
+      for r in regs:
+        old = values.get(r, r.reset)
+        values[r] = value
+        changed = old ^ value
+        if not changed:
+          continue
+        for name, shift, mask in r.layout:
+          if changed >> shift & mask:
+            yield Change(timestamp, r.peripheral, r.name, name,
+                         old >> shift & mask, value >> shift & mask)
+
+def _number(s):
+  try:
+    return int(s, 0)
+  except ValueError:
+    return float(s)
+
+def read_csv(f, chunk=CHUNK):
+  """(address, value, timestamp) of each line of text file f.
+
+  The first line is taken as a header only if it holds no number where
+  the address goes. Any other line that does not parse raises a
+  ValueError giving its line number.
+  """
+  number = 0
+  first = True
+  while True:
+    lines = f.readlines(chunk)
+    if not lines:
+      return
+    for line in lines:
+      number += 1
+      if not line.strip():
+        continue
+      columns = line.split(',')
+      if first:
+        first = False
+        if not columns[0].strip()[:1].isdigit():
+          # a header
+          continue
+      try:
+        address, value, timestamp = columns
+        record = (int(address, 0), int(value, 0), _number(timestamp))
+      except ValueError:
+        raise ValueError('line {}: expected address,value,timestamp, '
+                         'got {!r}'.format(number, line.rstrip('\n'))) from None
+      yield record
+
+def read_binary(f, record='<IIQ', chunk=CHUNK):
+  """(address, value, timestamp) of each packed record of binary file f.
+  """
+  record = struct.Struct(record)
+  size = max(1, chunk // record.size) * record.size
+  while True:
+    data = f.read(size)
+    if not data:
+      return
+    if len(data) % record.size:
+      raise ValueError('trace ends within a record of {} bytes'.format(record.size))
+    yield from record.iter_unpack(data)
+
+def main():
+  from ..lex import model
+
+  argparser = argparse.ArgumentParser(description='Decode the bitfield changes '
+                                                  'of a bus trace.')
+  argparser.add_argument('model', help='model file saved with --dump-model')
+  argparser.add_argument('trace', help='trace file, - for standard input')
+  argparser.add_argument('--binary', metavar='FORMAT', nargs='?', const='<IIQ',
+                         help="""records are packed as the struct FORMAT,
+                         by default %(const)s, rather than CSV""")
+  argparser.add_argument('--width', type=int, default=1,
+                         help="""addresses each register spans, a write to
+                         any of them being taken as one to the whole register""")
+  argparser.add_argument('--reserved', action='store_true',
+                         help='report writes to Reserved fields as well')
+  argparser.add_argument('--count', action='store_true',
+                         help='only count changes, as when timing')
+  args = argparser.parse_args()
+  logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+  with open(args.model) as f:
+    root = model.load(f)
+  decoder = TraceDecoder(AddressIndex(root, args.width, args.reserved))
+  if args.trace == '-':
+    trace = sys.stdin.buffer if args.binary else sys.stdin
+  else:
+    trace = open(args.trace, 'rb' if args.binary else 'r')
+  start = time.perf_counter()
+  with trace:
+    records = read_binary(trace, args.binary) if args.binary else read_csv(trace)
+    changes = 0
+    if args.count:
+      for _ in decoder.decode(records):
+        changes += 1
+    else:
+      write = sys.stdout.write
+      for change in decoder.decode(records):
+        write(str(change) + '\n')
+        changes += 1
+  seconds = time.perf_counter() - start
+  log.info('%d records, %d changes, %d to no register in %.2f s: %.0f records/s',
+           decoder.records, changes, decoder.unmapped, seconds,
+           decoder.records / seconds if seconds else 0)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,219 @@
+"""Text extraction backends, selected by the TextBackend cfg key.
+
+A backend turns pages of one PDF into text laid out as `pdftotext -layout`
+prints it, one string per page, numbered from 1:
+
+  pdftotext  runs the pdftotext tool once per range of pages (default)
+  poppler    parses the PDF once, in process, through the pdftotext Python
+             package, and keeps the document open across calls
+
+A backend that cannot be used here falls back to pdftotext. Backends
+may also report the words of each page with their boxes, for the column
+engine; for the others these are taken from the -layout text.
+"""
+import asyncio
+import logging
+import subprocess
+import threading
+
+from ..common import profiling
+from .columns import Words
+
+log = logging.getLogger(__name__)
+
+class Pdftotext:
+  """The pdftotext command line tool, run over each range of pages.
+  """
+  name = 'pdftotext'
+  flags = ['-layout', '-enc', 'UTF-8']
+
+  def __init__(self, pdftotext, pdf_fname):
+    self.pdftotext = pdftotext
+    self.pdf_fname = pdf_fname
+    self.args = [pdftotext] + self.flags + [pdf_fname, '-']
+
+  def identity(self):
+    """What besides the PDF determines the text, for cache keys.
+    """
+    version = subprocess.run([self.pdftotext, '-v'],
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT).stdout
+    return (version.decode('utf-8', 'replace').strip(),
+            ' '.join(self.flags))
+
+  def extract(self, first, last):
+    """Text of pages [first, last], stopping at the end of the document.
+    """
+    args = self.args + ['-f', str(first),
+                        '-l', str(last)]
+    with profiling.stage('pdftotext') as stage:
+      text = subprocess.check_output(args).decode('utf-8')
+      stage.bytes = len(text)
+    return self.split(text)
+
+  async def extract_async(self, first, last):
+    """extract(), without blocking the event loop while pdftotext runs.
+    """
+    args = self.args + ['-f', str(first),
+                        '-l', str(last)]
+    with profiling.stage('pdftotext') as stage:
+      proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE)
+      try:
+        out, _ = await proc.communicate()
+      finally:
+        if proc.returncode is None:
+          # cancelled, e.g. as another extraction failed
+          proc.kill()
+          await proc.wait()
+      text = out.decode('utf-8')
+      stage.bytes = len(text)
+    if proc.returncode:
+      raise subprocess.CalledProcessError(proc.returncode, args)
+    return self.split(text)
+
+  @staticmethod
+  def split(text):
+    pages = text.split('\f')
+    if pages[-1] == '':
+      pages.pop()
+    return pages
+
+  def extract_stream(self, first, last):
+    """Run pdftotext over pages [first, last], yielding output as it
+    arrives: (n, piece) for each piece of page n in order, then (n, None)
+    once page n is complete.
+    """
+    args = self.args + ['-f', str(first),
+                        '-l', str(last)]
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+    n = first
+    try:
+      for raw in proc.stdout:
+        pieces = raw.decode('utf-8').split('\f')
+        for piece in pieces[:-1]:
+          if piece:
+            yield n, piece
+          yield n, None
+          n += 1
+        if pieces[-1]:
+          yield n, pieces[-1]
+    finally:
+      proc.stdout.close()
+      if proc.poll() is None:
+        # the consumer stopped early
+        proc.kill()
+      proc.wait()
+    if proc.returncode:
+      raise subprocess.CalledProcessError(proc.returncode, args)
+    # pages past the end of the document come back empty
+    for n in range(n, last + 1):
+      yield n, None
+
+  def write(self, f):
+    """Write the text of every page to binary file f, as pdftotext
+    prints it.
+    """
+    subprocess.run(self.args, stdout=f, check=True)
+
+  def words(self, first, last):
+    """Words of pages [first, last] with their boxes, from pdftotext -tsv.
+    """
+    args = [self.pdftotext, '-tsv', '-enc', 'UTF-8',
+            '-f', str(first),
+            '-l', str(last),
+            self.pdf_fname, '-']
+    with profiling.stage('pdftotext -tsv') as stage:
+      text = subprocess.check_output(args).decode('utf-8')
+      stage.bytes = len(text)
+    pages = [Words() for _ in range(first, last + 1)]
+    # level page_num par_num block_num line_num word_num left top width height conf text
+    for line in text.splitlines()[1:]:
+      fields = line.split('\t', 11)
+      if fields[0] == '5':
+        pages[int(fields[1]) - first].append(*map(float, fields[6:10]), fields[11])
+    return pages
+
+class Poppler:
+  """Poppler in process, through the pdftotext Python package.
+
+  The PDF is parsed on first use and kept open, so later calls only lay
+  out the pages they ask for. Calls are serialized, as poppler documents
+  are not safe to share between threads.
+  """
+  name = 'poppler'
+
+  def __init__(self, pdftotext, pdf_fname):
+    import pdftotext as binding
+    self.binding = binding
+    self.pdf_fname = pdf_fname
+    self.document = None
+    self.lock = threading.Lock()
+
+  def identity(self):
+    from importlib import metadata
+    try:
+      version = metadata.version('pdftotext')
+    except metadata.PackageNotFoundError:
+      version = 'unknown'
+    return ('pdftotext-python ' + version, 'physical')
+
+  def open(self):
+    with open(self.pdf_fname, 'rb') as f:
+      return self.binding.PDF(f, physical=True)
+
+  def page(self, n):
+    """Text of page n as pdftotext prints it, or None past the end.
+    """
+    with self.lock:
+      if self.document is None:
+        self.document = self.open()
+      if n > len(self.document):
+        return None
+      text = self.document[n - 1]
+    # pdftotext ends the last line of a page before its form feed
+    if text and not text.endswith('\n'):
+      text += '\n'
+    return text
+
+  def extract(self, first, last):
+    pages = []
+    with profiling.stage('poppler') as stage:
+      for n in range(first, last + 1):
+        text = self.page(n)
+        if text is None:
+          break
+        pages.append(text)
+        stage.bytes += len(text)
+    return pages
+
+  def extract_stream(self, first, last):
+    for n in range(first, last + 1):
+      text = self.page(n)
+      if text:
+        yield n, text
+      yield n, None
+
+  def write(self, f):
+    n = 1
+    text = self.page(n)
+    while text is not None:
+      f.write((text + '\f').encode('utf-8'))
+      n += 1
+      text = self.page(n)
+
+backends = { backend.name : backend for backend in [Pdftotext, Poppler] }
+
+def new(name, pdftotext, pdf_fname):
+  """The backend called name for one PDF, or pdftotext if it is not
+  available here.
+  """
+  try:
+    backend = backends[name]
+  except KeyError:
+    raise ValueError('unknown TextBackend {}, expected one of: {}'.format(
+                     name, ' '.join(backends)))
+  try:
+    return backend(pdftotext, pdf_fname)
+  except ImportError as e:
+    log.warning('TextBackend %s is not available (%s), using pdftotext', name, e)
+    return Pdftotext(pdftotext, pdf_fname)
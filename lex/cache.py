@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+from ..common.files import write_atomic
+
+class TextCache:
+  """Content-addressed on-disk cache of extracted text.
+
+  Entries are files named by the SHA-256 of their key. Reading an entry
+  bumps its mtime, so eviction can drop the least recently used entries
+  once the directory grows past max_bytes. Entries are written to a
+  temporary file and renamed into place, which keeps the directory safe
+  to share between concurrent runs: readers see a whole entry or none.
+  """
+  def __init__(self, directory, max_bytes):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    os.makedirs(self.directory, exist_ok=True)
+
+  @staticmethod
+  def key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+      h.update(str(part).encode('utf-8'))
+      h.update(b'\0')
+    return h.hexdigest()
+
+  @staticmethod
+  def file_digest(fname, blocksize=1 << 20):
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+      for block in iter(lambda: f.read(blocksize), b''):
+        h.update(block)
+    return h.hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key[:2], key)
+
+  def __contains__(self, key):
+    return os.path.exists(self.path(key))
+
+  def get(self, key):
+    path = self.path(key)
+    try:
+      with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    return text
+
+  def put(self, key, text):
+    path = self.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, text.encode('utf-8'))
+
+  def entries(self):
+    for parent, _, fnames in os.walk(self.directory):
+      for fname in fnames:
+        if fname.endswith('.tmp'):
+          continue
+        path = os.path.join(parent, fname)
+        try:
+          st = os.stat(path)
+        except FileNotFoundError:
+          continue
+        yield (st.st_mtime, st.st_size, path)
+
+  def evict(self):
+    """Remove least recently used entries until the cache fits max_bytes.
+    """
+    entries = sorted(self.entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+      if total <= self.max_bytes:
+        break
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        # another run evicted it first
+        pass
+      total -= size
@@ -0,0 +1,278 @@
+"""Bitfield tables read by column, from the boxes of their words.
+
+The regex engine matches BitfieldLineRegex against one line of -layout
+text at a time, so a field name that wraps onto the next line, or a
+column that drifts, breaks it. This engine instead takes the words of
+each page with their positions, as `pdftotext -tsv` reports them, and
+infers the column boundaries of a table once from its heading row. Each
+later row is then split into Bit, Field, Type and Reset cells by where
+its words sit.
+
+Selected with BitfieldEngine = columns in the cfg file.
+"""
+import bisect
+import re
+from array import array
+
+from ..common import profiling
+from ..datastruct.regextree import LineClassifier
+from .register import BitfieldNode, table_predicate
+
+_word_re  = re.compile(r'\S+')
+_bits_re  = re.compile(r'(\d+)(?:[-:–](\d+))?')
+_field_re = re.compile(r'(?P<name>[A-Za-z_][\w.]*?)(?:\[(?P<hi>\d+):(?P<lo>\d+)\])?')
+_reset_re = re.compile(r'(?:0x)?([0-9a-fA-F]+)h?')
+
+# first word of a column heading, and the column it names
+_headings = { 'bit'     : 'bit',
+              'bits'    : 'bit',
+              'field'   : 'field',
+              'name'    : 'field',
+              'type'    : 'type',
+              'access'  : 'type',
+              'reset'   : 'reset',
+              'default' : 'reset',
+            }
+
+class Words:
+  """Words of one page, kept column by column: the left and right edge,
+  top and height of each word's box, and its text.
+
+  Coordinates are points from the top left of the page, or characters
+  and lines for words taken from -layout text. A page is read by every
+  table window it falls in, so its rows are worked out only once.
+  """
+  __slots__ = ('left', 'right', 'top', 'height', 'text', '_rows')
+
+  def __init__(self):
+    self.left   = array('d')
+    self.right  = array('d')
+    self.top    = array('d')
+    self.height = array('d')
+    self.text   = []
+    self._rows  = None
+
+  def append(self, left, top, width, height, text):
+    self.left.append(left)
+    self.right.append(left + width)
+    self.top.append(top)
+    self.height.append(height)
+    self.text.append(text)
+    self._rows = None
+
+  def __len__(self):
+    return len(self.text)
+
+  @classmethod
+  def from_layout(cls, text):
+    """Words of a page of -layout text, placed by character and line.
+    """
+    words = cls()
+    for y, line in enumerate(text.splitlines()):
+      for m in _word_re.finditer(line):
+        words.append(m.start(), y, m.end() - m.start(), 1, m.group())
+    return words
+
+  def to_tsv(self):
+    """The words as text, one tab separated left, right, top, height
+    and text per line, from which from_tsv() rebuilds them exactly.
+    """
+    return ''.join('{!r}\t{!r}\t{!r}\t{!r}\t{}\n'.format(*word)
+                   for word in zip(self.left, self.right, self.top, self.height,
+                                   self.text))
+
+  @classmethod
+  def from_tsv(cls, text):
+    words = cls()
+    for line in text.splitlines():
+      left, right, top, height, word = line.split('\t')
+      words.left.append(float(left))
+      words.right.append(float(right))
+      words.top.append(float(top))
+      words.height.append(float(height))
+      words.text.append(word)
+    return words
+
+  def rows(self):
+    """(indices, text) of each line of the page, top to bottom, with its
+    words left to right and their text joined by spaces. A word more than
+    half a height below the top of the first word of a line starts a new
+    one.
+    """
+    if self._rows is None:
+      self._rows = [(row, ' '.join([self.text[i] for i in row]))
+                    for row in self.lines()]
+    return self._rows
+
+  def lines(self):
+    tops = self.top.tolist()
+    order = range(len(tops))
+    if tops != sorted(tops):
+      order = sorted(order, key=tops.__getitem__)
+    heights = self.height
+    rows = []
+    below = float('-inf')
+    for i in order:
+      if tops[i] > below:
+        row = []
+        rows.append(row)
+        below = tops[i] + heights[i] / 2
+      row.append(i)
+    left = self.left.__getitem__
+    for row in rows:
+      row.sort(key=left)
+    return rows
+
+class Columns:
+  """Column boundaries of a table, inferred from its heading row.
+  """
+  def __init__(self, names, bounds):
+    self.names = names
+    self.bounds = bounds
+
+  @classmethod
+  def infer(cls, words, row):
+    """Columns of a heading row, or None if row has no Bit and Field
+    headings. Words of one heading, like Reset Value, sit closer than
+    their height; columns are split halfway between headings.
+    """
+    headings = []
+    for i in row:
+      if headings and words.left[i] - headings[-1][2] <= words.height[i]:
+        headings[-1][2] = words.right[i]
+      else:
+        headings.append([words.text[i].lower(), words.left[i], words.right[i]])
+    names = [_headings.get(name, name) for name, _, _ in headings]
+    if 'bit' not in names or 'field' not in names:
+      return None
+    return cls(names,
+               [(a[2] + b[1]) / 2 for a, b in zip(headings, headings[1:])])
+
+  def cells(self, words, row):
+    """Text of each column in row, with the words of a cell joined as
+    they were split, e.g. across a line break or around a dash.
+    """
+    cells = dict.fromkeys(self.names, '')
+    for i in row:
+      name = self.names[bisect.bisect(self.bounds, (words.left[i] + words.right[i]) / 2)]
+      cells[name] += words.text[i]
+    return cells
+
+class ColumnTable:
+  """The bitfield table of one register, read row by row.
+
+  Rows before a table header naming the register are skipped, and the
+  heading row below it sets the columns. A row with a bit range in the
+  Bit column starts a field; a row right after it with only a name in
+  the Field column continues that name. The table ends at the header of
+  another register's table, or at the first field row after the field
+  reaching bit 0, unless a header naming the register again came between,
+  as for the LSW half of a table split in two.
+  """
+  def __init__(self, name, header_re):
+    self.name = name
+    self.header_re = header_re
+    self.candidate = LineClassifier.get((header_re,)).candidate
+    self.tablematches = 0
+    self.columns = None
+    self.fields = []
+    self.wrapping = False
+    self.exhausted = False
+    self.finished = False
+
+  @property
+  def complete(self):
+    return self.finished or self.exhausted
+
+  def build(self, pages):
+    for words in pages:
+      for row, line in words.rows():
+        if not self.feed(words, row, line):
+          return
+
+  def feed(self, words, row, line):
+    """Take one row, returning whether the table may go on after it.
+    """
+    m = (self.candidate is None or self.candidate(line)) and self.header_re.search(line)
+    if m:
+      if table_predicate(self.name, m) == 'nameok':
+        self.tablematches += 1
+        self.columns = None
+        self.exhausted = False
+      elif self.tablematches > 0:
+        self.finished = True
+        return False
+      return True
+    if self.tablematches < 1:
+      return True
+    columns = Columns.infer(words, row)
+    if columns:
+      # a table continued on another page repeats its heading
+      self.columns = columns
+      self.wrapping = False
+      return True
+    if self.columns is None:
+      return True
+    return self.row(self.columns.cells(words, row))
+
+  def row(self, cells):
+    bits = _bits_re.fullmatch(cells['bit'])
+    if bits is None:
+      if cells['bit']:
+        # prose, or page furniture
+        self.wrapping = False
+        return True
+      if self.wrapping and cells['field']:
+        self.fields[-1][0] += cells['field']
+      else:
+        self.wrapping = False
+      return True
+    if self.exhausted:
+      return False
+    if not _field_re.fullmatch(cells['field']):
+      self.wrapping = False
+      return True
+    hi, lo = bits.groups()
+    physbits = (int(hi), int(lo) if lo else int(hi))
+    reset = _reset_re.fullmatch(cells.get('reset', ''))
+    self.fields.append([cells['field'], physbits, int(reset.group(1), 16) if reset else 0])
+    self.wrapping = True
+    if physbits[1] == 0:
+      self.exhausted = True
+    return True
+
+  def nodes(self):
+    reserved_ct = 0
+    for name, physbits, reset in self.fields:
+      node = BitfieldNode()
+      m = _field_re.fullmatch(name)
+      node.name = m.group('name') if m else name
+      if 'Reserved' in node.name:
+        node.name = '__reserved{}'.format(reserved_ct)
+        reserved_ct += 1
+      node.physbits = physbits
+      if m and m.group('hi'):
+        node.logbits = (int(m.group('hi')), int(m.group('lo')))
+      else:
+        node.logbits = physbits
+      node.reset = reset
+      yield node
+
+def lex_table(name, pages, header_re, profiled=False):
+  """Lex the bitfield table of one register out of the Words of its
+  pages. Returns what lex.lex_table does.
+  """
+  if not profiled:
+    return _lex_table(name, pages, header_re) + (None,)
+  with profiling.collecting() as profiler:
+    with profiling.stage('ColumnTable') as stage:
+      stage.bytes = sum(len(text) + 1 for words in pages for text in words.text)
+      result = _lex_table(name, pages, header_re)
+  return result + (profiler.data(),)
+
+def _lex_table(name, pages, header_re):
+  table = ColumnTable(name, header_re)
+  table.build(pages)
+  if not table.fields:
+    return (None, table.complete)
+  return (list(table.nodes()), table.complete)
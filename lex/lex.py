@@ -1,46 +1,351 @@
-import subprocess
+import itertools
+import logging
+from collections import deque
+from contextlib import contextmanager, nullcontext
 
 import pdftoregs.datastruct.tree as tree
 import pdftoregs.lex.register as register
+import pdftoregs.lex.columns as columns
+import pdftoregs.common.profiling as profiling
+from pdftoregs.common.progress import Progress
+from pdftoregs.lex.mapped import Span
+from pdftoregs.lex.pages import PageStore, open_store
+
+log = logging.getLogger(__name__)
+
+# bitfield table engines, and the profiling stage each times a table in
+engines = { 'regex'   : 'BitfieldTree',
+            'columns' : 'ColumnTable',
+          }
+
+def counted_lines(lines, stage):
+  for line in lines:
+    stage.bytes += len(line) + 1
+    yield line
+
+def lex_table(name, text, header_re, line_re, profiled=False):
+  """Lex the bitfield table of one register out of its page text.
+
+  Returns the bitfields in table order, or None if no table was found,
+  whether the table ended within text, and if profiled the profiling
+  data for the call. Lines after the end of the table are not read.
+  Kept at module level so it can run in a worker process.
+  """
+  if isinstance(text, Span):
+    # sent by reference, so read from this process's own mapping
+    text = str(text)
+  if not profiled:
+    return _lex_table(name, text, header_re, line_re) + (None,)
+  with profiling.collecting() as profiler:
+    with profiling.stage('BitfieldTree') as stage:
+      if isinstance(text, str):
+        stage.bytes = len(text)
+      else:
+        text = counted_lines(text, stage)
+      result = _lex_table(name, text, header_re, line_re)
+  return result + (profiler.data(),)
+
+def _lex_table(name, text, header_re, line_re):
+  try:
+    table = register.BitfieldTree(name, text, header_re, line_re)
+  except register.FilterTree.Empty as e:
+    return (None, e.complete)
+  return ([field.value for field in table], table.complete)
 
 class LexPDF:
   def __init__(self, name,
                pdftotext, pdf_fname,
-               regexes, exceptions):
+               regexes, exceptions,
+               jobs=1, cache=None, stream=False,
+               pool=None, pages=None, progress=False, backend='pdftotext',
+               engine='regex', lookahead=0, store='memory'):
+    if engine not in engines:
+      raise ValueError('unknown BitfieldEngine {}, expected one of: {}'.format(
+                       engine, ' '.join(engines)))
     self.name = name
-    self.default_args = [pdftotext,
-                         '-layout',
-                         '-enc', 'UTF-8',
-                         pdf_fname, '-']
+    if pages is None:
+      pages = open_store(pdftotext, pdf_fname, cache, backend, store)
+    self.pages = pages
     self.regexes = regexes
     self.exceptions = exceptions
+    self.jobs = jobs
+    self.stream = stream
+    self.pool = pool
+    self.engine = engine
+    self.lookahead = lookahead
+    self.show_progress = progress
+    self.progress = None
 
   def get_text(self, start, end):
-    args = self.default_args + ['-f', str(start),
-                                '-l', str(end)]
-    return subprocess.check_output(args).decode('utf-8')
+    with profiling.stage('LexPDF.get_text') as stage:
+      text = self.pages.get_text(start, end)
+      stage.bytes = len(text)
+    return text
 
-  def lex_entry(self, entry):
+  def shared_text(self, start, end):
+    with profiling.stage('LexPDF.get_text') as stage:
+      text = self.pages.shared_text(start, end)
+      stage.bytes = len(text)
+    return text
+
+  def table_text(self, entry):
     v = entry.value
-    if v.name in self.exceptions:
-      return
-    tablepgs = self.get_text(v.page,
-                             v.page + self.subsequent_pages)
-    try:
-      for field in register.BitfieldTree(v.name, tablepgs,
-                                         self.regexes['BitfieldHeader'],
-                                         self.regexes['BitfieldLine']):
-        entry.add_tree(field)
-    except register.FilterTree.Empty:
+    return self.get_text(v.page, v.page + self.subsequent_pages)
+
+  def table_words(self, entry):
+    v = entry.value
+    with profiling.stage('LexPDF.get_words'):
+      return self.pages.get_words(v.page, v.page + self.subsequent_pages)
+
+  def table_args(self, entry, text):
+    return (entry.value.name, text,
+            self.regexes['BitfieldHeader'],
+            self.regexes['BitfieldLine'],
+            profiling.active() is not None)
+
+  def column_args(self, entry):
+    return (entry.value.name, self.table_words(entry),
+            self.regexes['BitfieldHeader'],
+            profiling.active() is not None)
+
+  def add_fields(self, entry, fields, timings=None):
+    v = entry.value
+    if timings:
+      profiler = profiling.active()
+      profiler.merge(timings)
+      table = timings['stages'][engines[self.engine]]
+      profiler.register(self.name, v.name, table['seconds'], table['bytes'])
+    if fields is None:
       self.exceptions.append(v.name)
-    print('register {}, p{}'.format(v.name, v.page))
+    else:
+      for field in fields:
+        entry.add(field)
+    log.debug('register %s, p%d', v.name, v.page)
+    if self.progress:
+      self.progress.step()
 
-  def build(self, last_page, subsequent_pages, extras):
-    self.toc = register.ToC(self.name,
-                            self.get_text(0, last_page),
-                            self.regexes['Section'],
-                            self.regexes['Register'],
-                            extras)
+  @contextmanager
+  def workers(self):
+    """The worker pool shared with other lexers if one was given,
+    otherwise a pool for the duration of the block.
+    """
+    if self.pool:
+      yield self.pool
+    else:
+      from concurrent.futures import ProcessPoolExecutor
+      with ProcessPoolExecutor(self.jobs) as pool:
+        yield pool
+
+  def lex_entry(self, entry):
+    if self.engine == 'columns':
+      result = columns.lex_table(*self.column_args(entry))
+    else:
+      result = lex_table(*self.table_args(entry, self.table_text(entry)))
+    fields, _, timings = result
+    self.add_fields(entry, fields, timings)
+
+  def lex_columns(self, entries):
+    """Lex entries with the column engine, each from the words of its
+    whole window, across a process pool if there is more than one job.
+    """
+    if self.jobs < 2 or not entries:
+      for entry in entries:
+        self.lex_entry(entry)
+      return
+    with self.workers() as pool:
+      results = pool.map(columns.lex_table,
+                         *zip(*map(self.column_args, entries)),
+                         chunksize=max(1, len(entries) // (4*self.jobs)))
+      for entry, (fields, _, timings) in zip(entries, results):
+        self.add_fields(entry, fields, timings)
+
+  def lex_parallel(self, entries):
+    """Lex entries across a process pool, each from its whole window,
+    merging the results back in ToC order so the outcome matches a
+    serial run.
+    """
+    s = self.subsequent_pages
+    with self.workers() as pool:
+      texts = [self.shared_text(entry.value.page, entry.value.page + s)
+               for entry in entries]
+      results = pool.map(lex_table,
+                         *zip(*map(self.table_args, entries, texts)),
+                         chunksize=max(1, len(entries) // (4*self.jobs)))
+      for entry, (fields, _, timings) in zip(entries, results):
+        self.add_fields(entry, fields, timings)
+
+  def lex_streaming(self, entries):
+    """Lex entries from one streamed pdftotext pass per run of their
+    page index, holding only the pages of table windows not yet lexed.
+    """
+    if not entries:
+      return
+    s = self.subsequent_pages
+    pending = deque(sorted(range(len(entries)),
+                           key=lambda i: entries[i].value.page))
+    results = [None] * len(entries)
+    window = {}
+
+    def lex_ready(last):
+      while pending and entries[pending[0]].value.page + s <= last:
+        i = pending.popleft()
+        v = entries[i].value
+        text = ''.join(window[n] + '\f'
+                       for n in range(self.pages.first_page(v.page),
+                                      v.page + s + 1))
+        args = self.table_args(entries[i], text)
+        results[i] = pool.submit(lex_table, *args) if pool else lex_table(*args)
+
+    with self.workers() if self.jobs > 1 else nullcontext() as pool:
+      for n, text in (page for first, last in self.page_index(entries)
+                          for page in self.pages.stream(first, last)):
+        window[n] = text
+        lex_ready(n)
+        if pending:
+          for k in [k for k in window if k < entries[pending[0]].value.page]:
+            del window[k]
+      for entry, result in zip(entries, results):
+        fields, _, timings = result.result() if pool else result
+        self.add_fields(entry, fields, timings)
+
+  def extraction_plan(self, entries):
+    """Runs of pages to extract before each entry can be lexed: those of
+    its window neither available yet nor planned for an earlier entry.
+    """
+    planned = set()
+    plan = []
+    for entry in entries:
+      v = entry.value
+      pages = [n for n in range(self.pages.first_page(v.page),
+                                v.page + self.subsequent_pages + 1)
+               if n not in planned and not self.pages.available(n)]
+      planned.update(pages)
+      plan.append(list(PageStore.runs(pages)))
+    return plan
+
+  def lex_pipelined(self, entries):
+    """Lex entries in ToC order while the pages of up to lookahead entries
+    ahead are extracted, each by a pdftotext process of its own, so the
+    time taken approaches the larger of extracting and lexing rather than
+    their sum. Tables are lexed off the event loop, across the worker pool
+    if there is more than one job.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    with self.workers() if self.jobs > 1 else ThreadPoolExecutor(1) as executor:
+      asyncio.run(self._lex_pipelined(entries, executor))
+    if self.pages.cache:
+      self.pages.cache.evict()
+
+  async def _lex_pipelined(self, entries, executor):
+    import asyncio
+    loop = asyncio.get_running_loop()
+    plan = iter(self.extraction_plan(entries))
+    extracting = deque()
+    lexing = deque()
+
+    async def extract(runs):
+      for first, last in runs:
+        await self.pages.load_async(first, last)
+
+    def extract_next(count):
+      for runs in itertools.islice(plan, count):
+        extracting.append(loop.create_task(extract(runs)))
+
+    async def add_next():
+      entry, result = lexing.popleft()
+      fields, _, timings = await result
+      self.add_fields(entry, fields, timings)
+
+    extract_next(self.lookahead)
+    for entry in entries:
+      await extracting.popleft()
+      extract_next(1)
+      lexing.append((entry, loop.run_in_executor(executor, lex_table,
+                                                 *self.table_args(entry, self.table_text(entry)))))
+      # keep lexing within lookahead of extraction
+      while len(lexing) > self.lookahead or lexing and lexing[0][1].done():
+        await add_next()
+    while lexing:
+      await add_next()
+
+  def toc_text(self, last_page):
+    if self.stream:
+      return self.pages.stream_lines(0, last_page)
+    return self.get_text(0, last_page)
+
+  def build_toc(self, last_page, subsequent_pages, extras):
+    """Parse the table of contents, returning the register entries
+    that should be lexed.
+    """
+    with profiling.stage('ToC') as stage:
+      text = self.toc_text(last_page)
+      if isinstance(text, str):
+        stage.bytes = len(text)
+      else:
+        text = counted_lines(text, stage)
+      self.toc = register.ToC(self.name,
+                              text,
+                              self.regexes['Section'],
+                              self.regexes['Register'],
+                              extras)
     self.subsequent_pages = subsequent_pages
-    for entry in self.toc:
-      self.lex_entry(entry)
+    return [entry for entry in self.toc
+            if entry.value.name not in self.exceptions]
+
+  def exclude(self, entries, excluded):
+    """Drop the peripherals whose name excluded() is true for from the
+    tree, returning the entries of the others.
+    """
+    root = self.toc.t.root
+    for periph in list(root.children.values()):
+      if excluded(periph.value.name):
+        log.info('skipping %s due to exclusion', periph.value.name)
+        del root.children[periph.key]
+    return [entry for entry in entries
+            if entry.parent.key in root.children]
+
+  def page_index(self, entries):
+    """Runs of pages the tables of entries may sit on. Each entry needs
+    its first page and SubsequentPages more; overlapping or adjacent
+    windows are merged, so chapters without register tables are left out.
+    """
+    s = self.subsequent_pages
+    return [(first, last + s)
+            for first, last in PageStore.runs((self.pages.first_page(entry.value.page)
+                                               for entry in entries),
+                                              gap=s)]
+
+  def load_pages(self, entries):
+    # extract every page of the index up front, one pdftotext run per run
+    # of pages. Tables are then lexed from their whole windows: fetching
+    # the pages after a table's first one only once it runs onto them
+    # would save pages but cost a pdftotext run for nearly every table.
+    # Streaming reads the same runs as it lexes and pipelining extracts
+    # them table by table, so neither loads pages here
+    if self.engine == 'columns':
+      for first, last in self.page_index(entries):
+        self.pages.load_words(first, last)
+    elif not self.stream and not self.lookahead:
+      for first, last in self.page_index(entries):
+        self.pages.load(first, last)
+
+  def lex_entries(self, entries):
+    if self.show_progress and entries:
+      self.progress = Progress(self.name, len(entries))
+    if self.engine == 'columns':
+      self.lex_columns(entries)
+    elif self.lookahead:
+      self.lex_pipelined(entries)
+    elif self.stream:
+      self.lex_streaming(entries)
+    elif self.jobs > 1:
+      self.lex_parallel(entries)
+    else:
+      for entry in entries:
+        self.lex_entry(entry)
+
+  def build(self, last_page, subsequent_pages, extras):
+    entries = self.build_toc(last_page, subsequent_pages, extras)
+    self.load_pages(entries)
+    self.lex_entries(entries)
@@ -0,0 +1,142 @@
+"""Page text of a whole PDF in one file, mapped into memory.
+
+Keeping every extracted page of a manual thousands of pages long as a
+Python string costs memory in the lexer and again in each worker it is
+pickled to. With TextStore = mapped the text is instead extracted once,
+as pdftotext prints it, to <PdfFname>.txt next to the PDF, with the byte
+offset of each page in <PdfFname>.idx. The file is mapped read-only, so
+pages are read from the OS page cache, shared by every process mapping
+it, and decoded only while a table is lexed.
+"""
+import functools
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Mapping
+
+from ..common import profiling
+from ..common.files import atomic_write, write_atomic
+from .cache import TextCache
+
+version = 1
+
+@functools.lru_cache(maxsize=None)
+def _map(path, stamp):
+  """path mapped read-only, once per process and version of the file.
+  """
+  with open(path, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      # an empty file cannot be mapped
+      return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _stamp(path):
+  st = os.stat(path)
+  return (st.st_mtime_ns, st.st_size)
+
+class Span:
+  """Text of a run of pages of a mapped file, as PageStore.get_text()
+  would return it. A Span pickles as a reference to the file, so a worker
+  process maps the file itself rather than being sent the text.
+  """
+  __slots__ = ('path', 'stamp', 'lo', 'hi', 'pad')
+
+  def __init__(self, path, stamp, lo, hi, pad):
+    self.path = path
+    self.stamp = stamp
+    self.lo = lo
+    self.hi = hi
+    # pages past the end of the document
+    self.pad = pad
+
+  def __len__(self):
+    return self.hi - self.lo + self.pad
+
+  def __str__(self):
+    view = memoryview(_map(self.path, self.stamp))[self.lo:self.hi]
+    return str(view, 'utf-8') + '\f' * self.pad
+
+class MappedPages(Mapping):
+  """Pages of a mapped text file by number, from 1, decoded on access.
+
+  Stands in for the dict of a PageStore, which then finds every page
+  present and never extracts. Pages past the end of the document are
+  empty, as pdftotext prints them.
+  """
+  def __init__(self, path, offsets):
+    self.path = path
+    self.stamp = _stamp(path)
+    self.map = _map(path, self.stamp)
+    self.offsets = offsets
+
+  @classmethod
+  def open(cls, backend, pdf_fname):
+    """Map the text of pdf_fname, extracting it with backend first unless
+    the file next to the PDF is up to date.
+    """
+    path, index = pdf_fname + '.txt', pdf_fname + '.idx'
+    stamp = { 'version'  : version,
+              'digest'   : TextCache.file_digest(pdf_fname),
+              'identity' : list(backend.identity()),
+            }
+    try:
+      with open(index) as f:
+        recorded = json.load(f)
+      if (recorded['stamp'] == stamp and
+          os.path.getsize(path) == recorded['offsets'][-1]):
+        return cls(path, array('q', recorded['offsets']))
+    except (FileNotFoundError, ValueError, KeyError):
+      pass
+    with profiling.stage('TextStore.extract') as stage:
+      with atomic_write(path) as f:
+        backend.write(f)
+      stage.bytes = os.path.getsize(path)
+    pages = cls(path, cls.index(_map(path, _stamp(path))))
+    write_atomic(index, json.dumps({ 'stamp'   : stamp,
+                                     'offsets' : pages.offsets.tolist(),
+                                   }).encode('utf-8'))
+    return pages
+
+  @staticmethod
+  def index(text):
+    """Byte offsets of the start of each page of text, and of its end.
+    """
+    offsets = array('q', [0])
+    end = text.find(b'\f')
+    while end != -1:
+      offsets.append(end + 1)
+      end = text.find(b'\f', end + 1)
+    return offsets
+
+  def __len__(self):
+    return len(self.offsets) - 1
+
+  def __iter__(self):
+    return iter(range(1, len(self) + 1))
+
+  def __contains__(self, n):
+    return n >= 1
+
+  def __getitem__(self, n):
+    if n < 1:
+      raise KeyError(n)
+    if n > len(self):
+      return ''
+    return str(self.view(n, n)[:-1], 'utf-8')
+
+  def bounds(self, start, end):
+    last = len(self)
+    return (self.offsets[min(start, last + 1) - 1],
+            self.offsets[min(end, last)])
+
+  def view(self, start, end):
+    """The bytes of pages [start, end] within the document, form feeds
+    included, without copying them.
+    """
+    lo, hi = self.bounds(start, end)
+    return memoryview(self.map)[lo:hi]
+
+  def span(self, start, end):
+    lo, hi = self.bounds(start, end)
+    return Span(self.path, self.stamp, lo, hi, max(0, end - max(start - 1, len(self))))
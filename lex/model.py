@@ -0,0 +1,66 @@
+"""Serialization of the lexed register tree.
+
+A model file is JSON lines: a header naming the format and its version,
+then one line per node in depth-first order giving its depth, node type
+and fields. Loading one rebuilds the tree without running the lexer.
+"""
+import json
+
+from ..datastruct.tree import Tree
+from . import register
+
+FORMAT  = 'pdftoregs-model'
+VERSION = 1
+
+node_types = { cls.__name__ : cls
+               for cls in [register.DeviceNode,
+                           register.PeripheralNode,
+                           register.RegisterNode,
+                           register.BitfieldNode,
+                          ] }
+
+class ModelError(Exception):
+  pass
+
+def node_fields(value):
+  return { k : getattr(value, k)
+           for k in type(value).__slots__
+           if hasattr(value, k) }
+
+def dump(root, f):
+  f.write(json.dumps({ 'format'  : FORMAT,
+                       'version' : VERSION,
+                     }) + '\n')
+  for node in root:
+    f.write(json.dumps({ 'depth'  : node.depth - root.depth,
+                         'node'   : type(node.value).__name__,
+                         'fields' : node_fields(node.value),
+                       }, separators=(',', ':')) + '\n')
+
+def load(f):
+  try:
+    header = json.loads(f.readline())
+  except ValueError:
+    header = {}
+  if header.get('format') != FORMAT:
+    raise ModelError('not a {} file'.format(FORMAT))
+  if header.get('version') != VERSION:
+    raise ModelError('unsupported model version {}'.format(header.get('version')))
+
+  root = None
+  path = []
+  for line in f:
+    record = json.loads(line)
+    value = object.__new__(node_types[record['node']])
+    for k, v in record['fields'].items():
+      setattr(value, k, tuple(v) if isinstance(v, list) else v)
+    depth = record['depth']
+    if depth == 0:
+      root = Tree([value])
+      path = [root]
+    else:
+      del path[depth:]
+      path.append(path[-1].add(value))
+  if root is None:
+    raise ModelError('model file holds no device')
+  return root
@@ -0,0 +1,279 @@
+import asyncio
+import threading
+
+from . import backends
+from .columns import Words
+from .mapped import MappedPages
+
+class PageStore:
+  """In-memory store of extracted text, kept as one string per page.
+
+  Pages come from a text backend, pdftotext unless another is given, one
+  run per page range. Any window inside an extracted range is answered
+  without parsing the PDF again, formatted as pdftotext would print it.
+
+  With a TextCache, pages are also looked up on disk before extracting,
+  keyed by the PDF contents and the backend's version and flags.
+
+  A store may be shared between threads lexing the same PDF; loading is
+  serialized, so each page is extracted once.
+
+  Given MappedPages as pages, every page is already present and read
+  from the mapped file instead.
+  """
+  def __init__(self, pdftotext, pdf_fname, cache=None, backend=None, pages=None):
+    self.pdf_fname = pdf_fname
+    self.backend = backend or backends.Pdftotext(pdftotext, pdf_fname)
+    self.cache = cache
+    self.pages = {} if pages is None else pages
+    self.words = {}
+    self.lock = threading.RLock()
+
+  @staticmethod
+  def first_page(start):
+    # pdftotext numbers pages from 1 and treats anything lower as 1
+    return max(start, 1)
+
+  @property
+  def cache_prefix(self):
+    try:
+      return self._cache_prefix
+    except AttributeError:
+      self._cache_prefix = ((self.cache.file_digest(self.pdf_fname),) +
+                            self.backend.identity())
+    return self._cache_prefix
+
+  def cache_key(self, n, kind='text'):
+    if kind == 'text':
+      return self.cache.key(*self.cache_prefix, n, n)
+    return self.cache.key(*self.cache_prefix, kind, n, n)
+
+  def extract(self, first, last):
+    return self.backend.extract(first, last)
+
+  def extract_stream(self, first, last):
+    return self.backend.extract_stream(first, last)
+
+  async def extract_async(self, first, last):
+    extract = getattr(self.backend, 'extract_async', None)
+    if extract:
+      return await extract(first, last)
+    return await asyncio.to_thread(self.extract, first, last)
+
+  def lookup(self, n):
+    try:
+      return self.pages[n]
+    except KeyError:
+      pass
+    if self.cache:
+      return self.cache.get(self.cache_key(n))
+    return None
+
+  def available(self, n):
+    return n in self.pages or bool(self.cache) and self.cache_key(n) in self.cache
+
+  def stream_pieces(self, start, end):
+    """Pieces of pages [start, end] as extract_stream() yields them,
+    taken from memory or the cache where possible. Extracted pages are
+    cached but not kept in memory.
+    """
+    n = self.first_page(start)
+    while n <= end:
+      text = self.lookup(n)
+      if text is not None:
+        if text:
+          yield n, text
+        yield n, None
+        n += 1
+        continue
+      last = n
+      while last < end and not self.available(last + 1):
+        last += 1
+      page = []
+      for m, piece in self.extract_stream(n, last):
+        if piece is not None:
+          if self.cache:
+            page.append(piece)
+          yield m, piece
+          continue
+        if self.cache:
+          self.cache.put(self.cache_key(m), ''.join(page))
+          page = []
+        yield m, None
+      n = last + 1
+    if self.cache:
+      self.cache.evict()
+
+  def stream(self, start, end):
+    """Yield (n, text) for pages [start, end], holding one page at a time.
+    """
+    page = []
+    for n, piece in self.stream_pieces(start, end):
+      if piece is None:
+        yield n, ''.join(page)
+        page = []
+      else:
+        page.append(piece)
+
+  def stream_lines(self, start, end):
+    """Yield the lines of get_text(start, end) as pdftotext prints them.
+    """
+    partial = ''
+    for n, piece in self.stream_pieces(start, end):
+      if piece is None:
+        # the form feed ends the last line of the page
+        yield from (partial + '\f').splitlines()
+        partial = ''
+        continue
+      lines = (partial + piece).splitlines(True)
+      last = lines.pop()
+      if last.splitlines()[0] == last:
+        partial = last
+      else:
+        lines.append(last)
+        partial = ''
+      for line in lines:
+        yield line.splitlines()[0]
+
+  def missing(self, start, end):
+    """Contiguous runs of pages in [start, end] not yet extracted.
+    """
+    run = None
+    for n in range(self.first_page(start), end + 1):
+      if n in self.pages:
+        if run:
+          yield run
+          run = None
+      elif run:
+        run = (run[0], n)
+      else:
+        run = (n, n)
+    if run:
+      yield run
+
+  def load_cached(self, start, end):
+    for n in range(self.first_page(start), end + 1):
+      if n not in self.pages:
+        text = self.cache.get(self.cache_key(n))
+        if text is not None:
+          self.pages[n] = text
+
+  def load(self, start, end):
+    with self.lock:
+      if self.cache:
+        self.load_cached(start, end)
+      extracted = False
+      for first, last in list(self.missing(start, end)):
+        self.store(first, last, self.extract(first, last))
+        extracted = True
+      if extracted and self.cache:
+        self.cache.evict()
+
+  def store(self, first, last, pages):
+    with self.lock:
+      for n in range(first, last + 1):
+        # pages past the end of the document come back empty
+        self.pages[n] = pages[n - first] if n - first < len(pages) else ''
+        if self.cache:
+          self.cache.put(self.cache_key(n), self.pages[n])
+
+  async def load_async(self, first, last):
+    """Extract pages [first, last] without blocking the event loop. The
+    caller makes sure no other extraction is loading them.
+    """
+    self.store(first, last, await self.extract_async(first, last))
+
+  @staticmethod
+  def runs(pages, gap=0):
+    """Group page numbers into (first, last) runs, bridging gaps of up
+    to gap pages.
+    """
+    run = None
+    for n in sorted(set(pages)):
+      if run and n <= run[1] + 1 + gap:
+        run = (run[0], n)
+      else:
+        if run:
+          yield run
+        run = (n, n)
+    if run:
+      yield run
+
+  def load_pages(self, pages, gap=0):
+    """Extract the given pages, one extraction per run of pages.
+    Bridging small gaps trades a few unneeded pages for fewer runs.
+    """
+    for first, last in self.runs(map(self.first_page, pages), gap):
+      self.load(first, last)
+
+  def load_words(self, start, end):
+    """Words of pages [start, end], from the cache where possible, or
+    else extracted and cached alongside the page text.
+    """
+    with self.lock:
+      missing = []
+      for n in range(self.first_page(start), end + 1):
+        if n in self.words:
+          continue
+        text = self.cache.get(self.cache_key(n, 'words')) if self.cache else None
+        if text is None:
+          missing.append(n)
+        else:
+          self.words[n] = Words.from_tsv(text)
+      extract = getattr(self.backend, 'words', None)
+      for first, last in self.runs(missing):
+        if extract:
+          pages = extract(first, last)
+        else:
+          self.load(first, last)
+          pages = [Words.from_layout(self.pages[n]) for n in range(first, last + 1)]
+        for n in range(first, last + 1):
+          self.words[n] = pages[n - first] if n - first < len(pages) else Words()
+          if self.cache:
+            self.cache.put(self.cache_key(n, 'words'), self.words[n].to_tsv())
+      if missing and self.cache:
+        self.cache.evict()
+
+  def get_words(self, start, end):
+    """Words of pages [start, end] with their boxes, as the backend
+    reports them, or else as they are laid out in the page text.
+    """
+    self.load_words(start, end)
+    return [self.words[n] for n in range(self.first_page(start), end + 1)]
+
+  def __contains__(self, n):
+    return n in self.pages
+
+  def __len__(self):
+    return len(self.pages)
+
+  def get_text(self, start, end):
+    """Text of pages [start, end], formatted as pdftotext would print it.
+    """
+    self.load(start, end)
+    return ''.join(self.pages[n] + '\f'
+                   for n in range(self.first_page(start), end + 1))
+
+  def shared_text(self, start, end):
+    """get_text(start, end), or with mapped pages a Span of it, which
+    is cheap to send to a worker process.
+    """
+    if isinstance(self.pages, MappedPages):
+      return self.pages.span(self.first_page(start), end)
+    return self.get_text(start, end)
+
+stores = ['memory', 'mapped']
+
+def open_store(pdftotext, pdf_fname, cache=None, backend='pdftotext', store='memory'):
+  """A PageStore for pdf_fname, extracting with the named backend and
+  keeping pages in memory or, with store mapped, in a file next to the
+  PDF that is extracted once and mapped.
+  """
+  if store not in stores:
+    raise ValueError('unknown TextStore {}, expected one of: {}'.format(
+                     store, ' '.join(stores)))
+  backend = backends.new(backend, pdftotext, pdf_fname)
+  if store == 'mapped':
+    return PageStore(pdftotext, pdf_fname, backend=backend,
+                     pages=MappedPages.open(backend, pdf_fname))
+  return PageStore(pdftotext, pdf_fname, cache, backend)
@@ -1,6 +1,14 @@
+import logging
 import re
 from ..datastruct.regextree import RegexTree
 
+log = logging.getLogger(__name__)
+
+# helpers for naming nodes, compiled once rather than per node
+_periph_name_re    = re.compile(r'[\w\s]*\((?P<name>\w+)\)[\w\s]*')
+_initials_re       = re.compile(r'\b[A-Z]')
+_before_regword_re = re.compile(r'([A-Z][A-Z0-9_]+(?= Register))')
+
 class ToC:
   """Object for stripping the information we care about
   out of a table of contents, given appropriate regexes.
@@ -44,7 +52,8 @@ class FilterTree(RegexTree):
       self.ok = ok
 
   class Empty(Exception):
-    pass
+    def __init__(self, complete=False):
+      self.complete = complete
 
   def __init__(self, name,
                filter_re, predicate,
@@ -52,6 +61,15 @@ class FilterTree(RegexTree):
     super().__init__(name, [(filter_re, self.factory)] + levels)
     self.predicate = predicate
     self.tablematches = 0
+    self.reserved_ct = 0
+    self.exhausted = False
+    self.finished = False
+
+  @property
+  def complete(self):
+    """Whether the table ended within the text built so far.
+    """
+    return self.finished or self.exhausted
 
   def __enter__(self):
     return self
@@ -60,7 +78,7 @@ class FilterTree(RegexTree):
     if isinstance(evalue, (self.Finished, type(None))):
       nodes = self.root.children.values()
       if len(nodes) == 0:
-        raise self.Empty
+        raise self.Empty(self.complete)
       else:
         self.accepted = iter(nodes)
         return True
@@ -71,9 +89,13 @@ class FilterTree(RegexTree):
     result = self.predicate(match)
     if result == 'newtable':
       if self.tablematches > 0:
+        self.finished = True
         raise self.Finished(True)
     elif result == 'nameok':
+      # a second table for the register, as the LSW half of one split in
+      # two, restarts it even after the first reached bit 0
       self.tablematches += 1
+      self.exhausted = False
     return (self, None)
 
   def build(self, text):
@@ -81,6 +103,8 @@ class FilterTree(RegexTree):
       super().build(text)
 
 class DeviceNode:
+  __slots__ = ('name',)
+
   def __init__(self, name):
     super().__init__()
     self.name = name
@@ -89,11 +113,13 @@ class DeviceNode:
     return self.name
 
 class PeripheralNode:
+  __slots__ = ('name',)
+
   def __init__(self, ctx, match):
     super().__init__()
     section = match.group('section')
-    print(section)
-    m = re.search(r'[\w\s]*\((?P<name>\w+)\)[\w\s]*', section)
+    log.debug('section %s', section)
+    m = _periph_name_re.search(section)
     if m:
       self.name = m.group('name')
     else:
@@ -103,6 +129,8 @@ class PeripheralNode:
     return self.name
 
 class RegisterNode:
+  __slots__ = ('name', 'offset', 'reset', 'page')
+
   def __init__(self, ctx, match):
     self.name   = match.group('regname')
     self.offset = int(match.group('offset'), 16)
@@ -117,12 +145,40 @@ class RegisterNode:
     """Alternate constructor, directly from dict of values instead of regex match.
     """
     self = object.__new__(RegisterNode)
-    self.__dict__.update(fields)
+    for k, v in fields.items():
+      setattr(self, k, v)
     return self
 
   def __str__(self):
     return 'Reg {} p{}'.format(self.name, self.page)
 
+def table_predicate(name, match):
+  """Whether a bitfield table header names the register called name:
+  'nameok' if so, 'newtable' if it belongs to another register.
+  """
+  candidates = [match.group('regname')]
+
+  try:
+    # guess that the name is given by the first capital letters
+    fullname = match.group('fullname')
+  except IndexError:
+    fullname = ''
+  merged = ''.join(_initials_re.findall(fullname))
+  candidates.append(merged)
+
+  try:
+    # guess that the name precedes the word Register
+    previous = _before_regword_re.search(fullname).group(0)
+    candidates.append(previous)
+  except (AttributeError, IndexError):
+    pass
+
+  log.debug('name %s, candidates %s', name, candidates)
+  if name in candidates:
+    return 'nameok'
+  else:
+    return 'newtable'
+
 class BitfieldTree:
   def __init__(self, name, text, header_re, line_re):
     self.name = name
@@ -131,30 +187,12 @@ class BitfieldTree:
                          [(line_re, BitfieldNode.factory)])
     self._t.build(text)
 
-  def predicate(self, match):
-    candidates = [match.group('regname')]
-
-    try:
-      # guess that the name is given by the first capital letters
-      fullname = match.group('fullname')
-    except IndexError:
-      fullname = ''
-    merged = ''.join(re.findall(r'\b[A-Z]', fullname))
-    candidates.append(merged)
+  @property
+  def complete(self):
+    return self._t.complete
 
-    try:
-      # guess that the name precedes the word Register
-      previous = re.search(r'([A-Z][A-Z0-9_]+(?= Register))', fullname).group(0)
-      candidates.append(previous)
-    except (AttributeError, IndexError):
-      pass
-
-    print()
-    print('name {}, candidates {}'.format(self.name, candidates))
-    if self.name in candidates:
-      return 'nameok'
-    else:
-      return 'newtable'
+  def predicate(self, match):
+    return table_predicate(self.name, match)
 
   def __iter__(self):
     return self
@@ -163,8 +201,7 @@ class BitfieldTree:
     return next(self._t.accepted)
 
 class BitfieldNode:
-  reserved_ct = 0
-  proceed = True
+  __slots__ = ('name', 'physbits', 'logbits', 'reset')
 
   @staticmethod
   def get_slice(hi, lo):
@@ -172,27 +209,30 @@ class BitfieldNode:
 
   @staticmethod
   def factory(ctx, match):
-    if ctx:
-      if ctx.tablematches < 1:
-        return (ctx, None)
+    """Build a bitfield from a table line. Scanning state lives on the
+    FilterTree passed as ctx, so registers can be lexed independently.
+    Once a field reaches bit 0 the table is exhausted. A field line after
+    that ends it, and the tree stops reading further lines, unless a
+    header naming the register again restarted it.
+    """
+    if ctx.tablematches < 1:
+      return (ctx, None)
+    if ctx.exhausted:
+      ctx.proceed = False
+      return (ctx, None)
     self = BitfieldNode()
 
     self.name = match.group('fieldname')
-    if re.search('Reserved', self.name):
-      self.name = '__reserved{}'.format(BitfieldNode.reserved_ct)
-      __class__.reserved_ct += 1
+    if 'Reserved' in self.name:
+      self.name = '__reserved{}'.format(ctx.reserved_ct)
+      ctx.reserved_ct += 1
 
     self.physbits = self.get_slice(match.group('hibit'),
                                    match.group('lobit'))
 
-    if self.physbits[0] == 15:
-      print('restarting')
-      __class__.proceed = True
-    if not __class__.proceed:
-      return (ctx, None)
     if self.physbits[1] == 0:
-      print('exhausted')
-      __class__.proceed = False
+      log.debug('exhausted')
+      ctx.exhausted = True
 
     logbits = match.group('hibit_log'), match.group('lobit_log')
     if logbits == (None, None):
@@ -205,7 +245,7 @@ class BitfieldNode:
     except (TypeError, IndexError):
       self.reset = 0
 
-    print('    bitfield: {} [{}:{}]'.format(self.name, *self.physbits))
+    log.debug('    bitfield: %s [%d:%d]', self.name, *self.physbits)
     return (ctx, self)
 
   def __str__(self):
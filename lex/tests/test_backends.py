@@ -0,0 +1,34 @@
+import importlib.util
+import threading
+import unittest
+import pdftoregs.lex.backends as uut
+from pdftoregs.lex.pages import PageStore
+
+class TestBackends(unittest.TestCase):
+  class OpenPoppler(uut.Poppler):
+    """Poppler backend over a document that is already open.
+    """
+    def __init__(self, document):
+      self.document = document
+      self.lock = threading.Lock()
+
+  def test_unknown(self):
+    with self.assertRaises(ValueError):
+      uut.new('xpdf', 'pdftotext', 'doc.pdf')
+
+  @unittest.skipIf(importlib.util.find_spec('pdftotext'),
+                   'the pdftotext package is installed')
+  def test_fallback(self):
+    with self.assertLogs(uut.log, 'WARNING'):
+      backend = uut.new('poppler', 'pdftotext', 'doc.pdf')
+    self.assertIsInstance(backend, uut.Pdftotext)
+
+  def test_poppler_pages(self):
+    store = PageStore(None, None, backend=self.OpenPoppler(['a\n  b', '', 'c\n']))
+    self.assertEqual(store.get_text(0, 4), 'a\n  b\n\f\fc\n\f\f')
+    store = PageStore(None, None, backend=self.OpenPoppler(['a\n  b', '', 'c\n']))
+    self.assertEqual(list(store.stream_lines(1, 4)),
+                     'a\n  b\n\f\fc\n\f\f'.splitlines())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import pdftoregs.lex.columns as uut
+from pdftoregs.bench import synthetic
+
+HEADER = 'Table 1-1. Control Register (CTRL) Field Descriptions'
+
+class TestColumnTable(unittest.TestCase):
+  header_re = synthetic.regexes()['BitfieldHeader']
+
+  def lex(self, *pages):
+    return uut.lex_table('CTRL', [uut.Words.from_layout(page) for page in pages],
+                         self.header_re)
+
+  def test_wrapped_and_drifting(self):
+    fields, complete, _ = self.lex('\n'.join([
+      'Some prose about CTRL.',
+      HEADER,
+      '  Bit     Field       Type   Reset  Description',
+      '  15-8    Reserved      R     0h     reads as zero',
+      '  7-4     CLK_          R/W    5h    clock divider, wrapping',
+      '          DIV                        onto the next line',
+      '  3       MODE[1:1]   R/W    1h     mode',
+      '                                    more about the mode',
+      '  2-0     EN            R/W  0h     enable',
+      'More prose about CTRL.',
+      'Table 1-2. Status Register (STAT) Field Descriptions',
+    ]))
+    self.assertTrue(complete)
+    self.assertEqual([(f.name, f.physbits, f.logbits, f.reset) for f in fields],
+                     [('__reserved0', (15, 8), (15, 8), 0),
+                      ('CLK_DIV', (7, 4), (7, 4), 5),
+                      ('MODE', (3, 3), (1, 1), 1),
+                      ('EN', (2, 0), (2, 0), 0)])
+
+  def test_continued_on_next_page(self):
+    fields, complete, _ = self.lex('\n'.join([HEADER,
+                                              'Bit  Field  Type  Reset',
+                                              '15-4 HI     R/W   0h']),
+                                   '\n'.join([HEADER + ' (continued)',
+                                              '  Bit    Field   Type   Reset',
+                                              '  3-0    LO      R/W    0h']))
+    self.assertTrue(complete)
+    self.assertEqual([f.name for f in fields], ['HI', 'LO'])
+
+  def test_two_halves(self):
+    fields, complete, _ = self.lex('\n'.join([
+      'Table 1-1. Control Register MSW (CTRL) Field Descriptions',
+      '  Bit     Field     Type   Reset',
+      '  15-0    HI        R/W    0h',
+      'The low half follows.',
+      'Table 1-2. Control Register LSW (CTRL) Field Descriptions',
+      '  Bit     Field     Type   Reset',
+      '  15-0    LO        R/W    0h',
+      '  15-0    OTHER     R/W    0h',
+    ]))
+    self.assertTrue(complete)
+    self.assertEqual([f.name for f in fields], ['HI', 'LO'])
+
+  def test_other_table(self):
+    fields, complete, _ = self.lex('Table 1-2. Status Register (STAT) Field Descriptions\n'
+                                   'Bit  Field  Type  Reset\n'
+                                   '15-0 S      R     0h\n')
+    self.assertIsNone(fields)
+    self.assertFalse(complete)
+
+  def test_tsv(self):
+    words = uut.Words()
+    words.append(0.1, 20.5, 0.2, 10, 'a')
+    words.append(72.25, 40, 3.5, 9.75, 'Reset[0]')
+    again = uut.Words.from_tsv(words.to_tsv())
+    self.assertEqual([list(getattr(again, k)) for k in ['left', 'right', 'top', 'height', 'text']],
+                     [list(getattr(words, k)) for k in ['left', 'right', 'top', 'height', 'text']])
+
+  def test_rows(self):
+    words = uut.Words()
+    for left, top, text in [(50, 20.5, 'b'), (10, 20, 'a'), (10, 40, 'c')]:
+      words.append(left, top, 10, 10, text)
+    self.assertEqual([line for _, line in words.rows()], ['a b', 'c'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,120 @@
+import types
+import unittest
+from pdftoregs.common import profiling
+from pdftoregs.lex import lex, register
+from pdftoregs.lex.pages import PageStore
+from pdftoregs.bench import synthetic
+
+class TestPageIndex(unittest.TestCase):
+  def lexer(self, pages):
+    lexer = lex.LexPDF('dev', None, None, {}, [], pages=PageStore(None, None))
+    lexer.subsequent_pages = 2
+    root = synthetic.device([(periph_name, [('R{}'.format(page), page, 0, page, [])
+                                            for page in periph_pages])
+                             for periph_name, periph_pages in pages])
+    lexer.toc = types.SimpleNamespace(t=types.SimpleNamespace(root=root))
+    entries = [node for node in root if isinstance(node.value, register.RegisterNode)]
+    return lexer, entries
+
+  def test_windows_merged(self):
+    lexer, entries = self.lexer([('A', [20, 20, 21, 23]), ('B', [26, 40]), ('C', [0])])
+    # 23's window ends at 25, so 26 starts a window adjacent to it
+    self.assertEqual(lexer.page_index(entries), [(1, 3), (20, 28), (40, 42)])
+
+  def test_excluded_pages_dropped(self):
+    lexer, entries = self.lexer([('A', [20, 21]), ('B', [30, 31]), ('C', [40])])
+    entries = lexer.exclude(entries, lambda name: name == 'B')
+    self.assertEqual([e.value.page for e in entries], [20, 21, 40])
+    self.assertEqual(list(lexer.toc.t.root.children), ['A', 'C'])
+    self.assertEqual(lexer.page_index(entries), [(20, 23), (40, 42)])
+
+class ManualBackend:
+  """Pages of a synthetic manual, extracted in the calling thread.
+  """
+  def __init__(self, manual):
+    self.manual = manual
+    self.calls = []
+
+  def extract(self, first, last):
+    self.calls.append((first, last))
+    return [self.manual.pages[n] for n in range(first, min(last, self.manual.last_page) + 1)]
+
+  def extract_stream(self, first, last):
+    # in pieces that end mid-line, as pipe reads do
+    self.calls.append((first, last))
+    for n in range(first, last + 1):
+      text = self.manual.pages.get(n, '')
+      for i in range(0, len(text), 50):
+        yield n, text[i:i + 50]
+      yield n, None
+
+def lex_manual(manual, **options):
+  """Lex a synthetic manual, returning the lexer and the extractions
+  made after the table of contents.
+  """
+  backend = ManualBackend(manual)
+  lexer = lex.LexPDF('dev', None, None, synthetic.regexes(), [],
+                     pages=PageStore(None, None, backend=backend), **options)
+  entries = lexer.build_toc(manual.end_of_toc, 2, {})
+  del backend.calls[:]
+  lexer.load_pages(entries)
+  lexer.lex_entries(entries)
+  return lexer, backend.calls
+
+class TestLexModes(unittest.TestCase):
+  """Parallel and streaming lexing give the tree serial lexing does,
+  tables broken across pages included.
+  """
+  @classmethod
+  def setUpClass(cls):
+    cls.manual = synthetic.Manual(3, 8, 6, prose=2, quirks=True, split=True)
+    cls.serial, _ = lex_manual(cls.manual)
+
+  def test_serial_reads_split_tables(self):
+    self.assertEqual(self.serial.exceptions, [])
+    registers = [n for n in self.serial.toc.t.root
+                 if isinstance(n.value, register.RegisterNode)]
+    self.assertEqual([list(r.children.values())[-1].value.physbits[1] for r in registers],
+                     [0] * len(registers))
+
+  def test_parallel(self):
+    parallel, _ = lex_manual(self.manual, jobs=2)
+    self.assertEqual(str(parallel.toc.t.root), str(self.serial.toc.t.root))
+
+  def test_streaming(self):
+    for jobs in [1, 2]:
+      streaming, calls = lex_manual(self.manual, stream=True, jobs=jobs)
+      self.assertEqual(str(streaming.toc.t.root), str(self.serial.toc.t.root))
+      self.assertEqual(calls, [(self.manual.end_of_toc + 1, self.manual.last_page + 2)])
+
+  def test_toc_bytes_profiled(self):
+    # as get_text() gives it, whether read whole or streamed line by line
+    toc = ''.join(self.manual.pages[n] + '\f' for n in range(1, self.manual.end_of_toc + 1))
+    for stream in [False, True]:
+      profiler = profiling.Profiler()
+      with profiling.enabled(profiler):
+        lex_manual(self.manual, stream=stream)
+      self.assertEqual(profiler.data()['stages']['ToC']['bytes'], len(toc))
+
+class TestPipelined(unittest.TestCase):
+  def lex(self, manual, lookahead):
+    return lex_manual(manual, lookahead=lookahead)
+
+  def test_same_as_serial(self):
+    manual = synthetic.Manual(3, 10, 4, prose=2, quirks=True)
+    serial, _ = self.lex(manual, 0)
+    pipelined, calls = self.lex(manual, 3)
+    self.assertEqual(str(pipelined.toc), str(serial.toc))
+    self.assertGreater(len(calls), 3)
+    pages = [n for first, last in calls for n in range(first, last + 1)]
+    self.assertEqual(len(pages), len(set(pages)))
+
+  def test_windows_extracted_up_front(self):
+    # one extraction for the whole page index, none while lexing
+    manual = synthetic.Manual(3, 10, 4, prose=2, quirks=True)
+    lexer, calls = self.lex(manual, 0)
+    self.assertEqual(calls, [(manual.end_of_toc + 1, manual.last_page + 2)])
+    self.assertEqual(lexer.exceptions, [])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,50 @@
+import os
+import pickle
+import tempfile
+import unittest
+import pdftoregs.lex.mapped as uut
+from pdftoregs.lex.pages import PageStore
+
+class TestMappedPages(unittest.TestCase):
+  class Backend:
+    """Prints a fixed document, counting how often it is written.
+    """
+    document = ['page 1\n', '', 'päge 3\nline\n']
+
+    def __init__(self):
+      self.writes = 0
+
+    def identity(self):
+      return ('stand-in', '1')
+
+    def write(self, f):
+      self.writes += 1
+      f.write(''.join(page + '\f' for page in self.document).encode('utf-8'))
+
+    def extract(self, first, last):
+      return self.document[first - 1:last]
+
+  def test_pages(self):
+    backend = self.Backend()
+    with tempfile.TemporaryDirectory() as directory:
+      pdf = os.path.join(directory, 'doc.pdf')
+      with open(pdf, 'wb') as f:
+        f.write(b'%PDF')
+      mapped = PageStore(None, pdf, backend=backend,
+                         pages=uut.MappedPages.open(backend, pdf))
+      memory = PageStore(None, pdf, backend=backend)
+      for start, end in [(0, 1), (1, 3), (2, 5), (4, 6)]:
+        self.assertEqual(mapped.get_text(start, end), memory.get_text(start, end))
+        span = pickle.loads(pickle.dumps(mapped.shared_text(start, end)))
+        self.assertEqual(str(span), memory.get_text(start, end))
+      self.assertEqual(bytes(mapped.pages.view(3, 3)), 'päge 3\nline\n\f'.encode('utf-8'))
+
+      uut.MappedPages.open(backend, pdf)
+      self.assertEqual(backend.writes, 1)
+      with open(pdf, 'ab') as f:
+        f.write(b'changed')
+      uut.MappedPages.open(backend, pdf)
+      self.assertEqual(backend.writes, 2)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,28 @@
+import io
+import unittest
+from pdftoregs.bench import synthetic
+import pdftoregs.lex.model as uut
+
+class TestModel(unittest.TestCase):
+  def device(self):
+    fields = [('DATA', (15, 8), 0), ('__reserved0', (7, 0), 0)]
+    return synthetic.device([('UART', [('RBR', 0x1b00, 0, 852, fields),
+                                       ('IER', 0x1b02, 0, 852, fields)])])
+
+  def test_roundtrip(self):
+    root = self.device()
+    f = io.StringIO()
+    uut.dump(root, f)
+    f.seek(0)
+    loaded = uut.load(f)
+    self.assertEqual(str(loaded), str(root))
+    self.assertEqual([(type(n.value), uut.node_fields(n.value)) for n in loaded],
+                     [(type(n.value), uut.node_fields(n.value)) for n in root])
+
+  def test_version(self):
+    f = io.StringIO('{"format": "pdftoregs-model", "version": 0}\n')
+    with self.assertRaises(uut.ModelError):
+      uut.load(f)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+import pdftoregs.lex.pages as uut
+from pdftoregs.lex.cache import TextCache
+
+class TestPageStore(unittest.TestCase):
+  class FakeStore(uut.PageStore):
+    """Page store over a fixed 5-page document, counting extractions.
+    """
+    document = ['page {}\n'.format(n) for n in range(1, 6)]
+
+    def __init__(self, cache=None):
+      super().__init__('pdftotext', 'doc.pdf', cache)
+      self._cache_prefix = ('digest', 'version', 'flags')
+      self.calls = []
+
+    def extract(self, first, last):
+      self.calls.append((first, last))
+      return self.document[first - 1:last]
+
+  def test_single_extraction(self):
+    store = self.FakeStore()
+    store.load(0, 4)
+    self.assertEqual(store.get_text(2, 3), 'page 2\n\fpage 3\n\f')
+    self.assertEqual(store.get_text(0, 1), 'page 1\n\f')
+    self.assertEqual(store.calls, [(1, 4)])
+
+  def test_missing_runs(self):
+    store = self.FakeStore()
+    store.load(2, 2)
+    store.load(4, 4)
+    store.get_text(1, 5)
+    self.assertEqual(store.calls, [(2, 2), (4, 4), (1, 1), (3, 3), (5, 5)])
+
+  def test_past_end(self):
+    store = self.FakeStore()
+    self.assertEqual(store.get_text(5, 7), 'page 5\n\f\f\f')
+    self.assertEqual(store.calls, [(5, 7)])
+
+  def test_disk_cache(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = TextCache(directory, 1 << 20)
+      first = self.FakeStore(cache)
+      first.load(1, 3)
+      second = self.FakeStore(cache)
+      self.assertEqual(second.get_text(2, 4), 'page 2\n\fpage 3\n\fpage 4\n\f')
+      self.assertEqual(second.calls, [(4, 4)])
+
+  def test_cache_eviction(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = TextCache(directory, 16)
+      for n in range(4):
+        cache.put(cache.key(n), 'entry {}'.format(n))
+        os.utime(cache.path(cache.key(n)), (n, n))
+      cache.get(cache.key(0))
+      cache.evict()
+      self.assertEqual([cache.get(cache.key(n)) for n in range(4)],
+                       ['entry 0', None, None, 'entry 3'])
+
+  document = ['head\nline\n', 'no newline', '', 'a\r\nb\n\n', 'last\n']
+
+  def script(self, directory):
+    """Stand-in for pdftotext printing pages -f to -l of document.
+    """
+    script = os.path.join(directory, 'pdftotext')
+    with open(script, 'w') as f:
+      f.write('#!{}\n'.format(sys.executable))
+      f.write('import sys\n')
+      f.write('first = int(sys.argv[sys.argv.index("-f") + 1])\n')
+      f.write('last = int(sys.argv[sys.argv.index("-l") + 1])\n')
+      f.write('pages = {!r}[first - 1:last]\n'.format(self.document))
+      f.write('sys.stdout.write("".join(p + "\\f" for p in pages))\n')
+    os.chmod(script, 0o755)
+    return script
+
+  def test_stream(self):
+    document = self.document
+    with tempfile.TemporaryDirectory() as directory:
+      script = self.script(directory)
+      store = uut.PageStore(script, 'doc.pdf')
+      self.assertEqual(list(store.stream_lines(1, 7)),
+                       store.get_text(1, 7).splitlines())
+      store = uut.PageStore(script, 'doc.pdf')
+      self.assertEqual(list(store.stream(4, 6)),
+                       [(4, document[3]), (5, document[4]), (6, '')])
+      stream = store.stream_lines(1, 2)
+      self.assertEqual(next(stream), 'head')
+      stream.close()
+
+  def test_load_async(self):
+    with tempfile.TemporaryDirectory() as directory:
+      store = uut.PageStore(self.script(directory), 'doc.pdf')
+      asyncio.run(store.load_async(4, 6))
+    self.assertEqual(store.pages, { 4 : self.document[3], 5 : self.document[4], 6 : '' })
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,65 @@
+import configparser
+import os
+import re
+import unittest
+import pdftoregs
+import pdftoregs.lex.register as uut
+
+class TestBitfieldTree(unittest.TestCase):
+  table = ['Table 1-24. Clock Configuration Register 2 (CCR2) Field Descriptions',
+           '  Bit    Field     Type   Reset  Description',
+           '  15-8   RATE      R/W    1Fh    sample rate',
+           '   7-1   Reserved  R      0      Reserved',
+           '   0     EN        R/W    0h     enable',
+          ]
+
+  @classmethod
+  def setUpClass(cls):
+    cfg = configparser.ConfigParser()
+    cfg.read(os.path.join(os.path.dirname(pdftoregs.__file__), 'scanpdf.cfg'))
+    section = cfg['TI_TMS320C5517']
+    cls.header_re = re.compile(section['BitfieldHeaderRegex'], re.VERBOSE)
+    cls.line_re = re.compile(section['BitfieldLineRegex'], re.VERBOSE)
+
+  def lex(self, lines):
+    return uut.BitfieldTree('CCR2', lines, self.header_re, self.line_re)
+
+  def test_stops_after_last_bit(self):
+    other = ['  15-0   OTHER     R/W    0h     not in the table',
+             '  15-0   MORE      R/W    0h     not read']
+    consumed = []
+    def lines():
+      for line in self.table + other:
+        consumed.append(line)
+        yield line
+    table = self.lex(lines())
+    self.assertEqual([(f.value.name, f.value.physbits, f.value.reset) for f in table],
+                     [('RATE', (15, 8), 0x1f), ('__reserved0', (7, 1), 0), ('EN', (0, 0), 0)])
+    self.assertTrue(table.complete)
+    self.assertEqual(consumed, self.table + other[:1])
+
+  def test_two_halves(self):
+    # a 32 bit register, its table split in MSW and LSW halves
+    table = self.lex(['Table 1-24. Clock Count Register MSW (CCR2) Field Descriptions',
+                      '  Bit    Field          Type   Reset  Description',
+                      '  15-0   CNT_HI         R/W    0h     count, high half',
+                      'The low half of the count follows.',
+                      'Table 1-25. Clock Count Register LSW (CCR2) Field Descriptions',
+                      '  Bit    Field          Type   Reset  Description',
+                      '  15-1   CNT_LO         R/W    0h     count, low half',
+                      '   0     EN             R/W    1h     enable',
+                      'Table 1-26. Clock Configuration Register 3 (CCR3) Field Descriptions',
+                      '  15-0   OTHER          R/W    0h     next table'])
+    self.assertEqual([(f.value.name, f.value.physbits) for f in table],
+                     [('CNT_HI', (15, 0)), ('CNT_LO', (15, 1)), ('EN', (0, 0))])
+    self.assertTrue(table.complete)
+
+  def test_incomplete(self):
+    table = self.lex(self.table[:3])
+    self.assertFalse(table.complete)
+    with self.assertRaises(uut.FilterTree.Empty) as e:
+      self.lex(self.table[1:])
+    self.assertFalse(e.exception.complete)
+
+if __name__ == '__main__':
+  unittest.main()
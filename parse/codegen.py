@@ -1,3 +1,43 @@
+import os
+import threading
+
+from ..common.files import write_atomic
+
+def write_if_changed(fname, text):
+  """Write text to fname unless the file already holds exactly that,
+  leaving its mtime alone so builds depending on it stay up to date.
+  Returns whether the file was written.
+  """
+  data = text.encode('utf-8')
+  try:
+    if os.path.getsize(fname) == len(data):
+      with open(fname, 'rb') as f:
+        if f.read() == data:
+          return False
+  except FileNotFoundError:
+    pass
+  write_atomic(fname, data)
+  return True
+
+class OutputStats:
+  """Counts of generated files written and left unchanged, shared by
+  the threads emitting one tree.
+  """
+  def __init__(self):
+    self.written = 0
+    self.unchanged = 0
+    self.lock = threading.Lock()
+
+  def record(self, written):
+    with self.lock:
+      if written:
+        self.written += 1
+      else:
+        self.unchanged += 1
+
+  def __str__(self):
+    return '{} files written, {} unchanged'.format(self.written, self.unchanged)
+
 class Indent:
   def __init__(self, f, tabstop=2):
     self.f = f
@@ -1,14 +1,18 @@
+import logging
 import os.path
 from ..parse.translators.translator import BaseTranslator
 
+log = logging.getLogger(__name__)
+
 class CodeGenerator:
-  def __init__(self, lang, tree, params):
+  def __init__(self, lang, tree, params, jobs=1):
     self.translator = BaseTranslator.new(lang)
-    self.translator.walk(tree, params)
+    self.translator.walk(tree, params, jobs)
+    log.info('%s', self.translator.stats)
 
   def write(self, outdir):
     for unit in self.translator:
-      print('unit: {}'.format(node.name))
+      log.debug('unit: %s', node.name)
       with os.path.join(outdir,
                         node.name + node.extension + '.auto', 'w') as f:
         f.write(unit)
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from pdftoregs.bench import synthetic
+from pdftoregs.parse.translators.translator import BaseTranslator
+
+class TestCppTranslator(unittest.TestCase):
+  def device(self, peripherals=4, registers=3):
+    return synthetic.device([('P{}'.format(p),
+                              [('R{}'.format(r), 0x100*p + r, 0, 10, [('EN', (0, 0), 0)])
+                               for r in range(registers)])
+                             for p in range(peripherals)])
+
+  def emit(self, tree, jobs, outdir=None):
+    if outdir is None:
+      tmp = tempfile.TemporaryDirectory()
+      self.addCleanup(tmp.cleanup)
+      outdir = tmp.name
+    self.auto = os.path.join(outdir, 'auto')
+    params = { 'OutputDir' : outdir, 'ExcludePeriphs' : ['P3'] }
+    self.translator = BaseTranslator.new('cpp')
+    self.translator.walk(tree, params, jobs)
+    return self.files()
+
+  def files(self):
+    files = {}
+    for fname in os.listdir(self.auto):
+      with open(os.path.join(self.auto, fname)) as f:
+        files[fname] = f.read()
+    return files
+
+  def test_parallel_matches_serial(self):
+    cwd = os.getcwd()
+    serial = self.emit(self.device(), 1)
+    self.assertEqual(sorted(serial), ['P0_regs.cpp', 'P0_regs.hpp',
+                                      'P1_regs.cpp', 'P1_regs.hpp',
+                                      'P2_regs.cpp', 'P2_regs.hpp'])
+    self.assertEqual(self.emit(self.device(), 4), serial)
+    self.assertEqual(os.getcwd(), cwd)
+
+  def test_failed_peripheral_writes_nothing(self):
+    tree = self.device()
+    broken = list(tree.children.values())[1]
+    del next(iter(broken.children.values())).value.offset
+    with self.assertRaises(AttributeError):
+      self.emit(tree, 1)
+    # the error unwinds P1's open files, and stops the walk before P2
+    self.assertEqual(sorted(self.files()), ['P0_regs.cpp', 'P0_regs.hpp'])
+
+  def test_unchanged_files_not_rewritten(self):
+    self.emit(self.device(), 1)
+    outdir = os.path.dirname(self.auto)
+    hpp = os.path.join(self.auto, 'P0_regs.hpp')
+    os.utime(hpp, (0, 0))
+    tree = self.device()
+    next(iter(list(tree.children.values())[2].children.values())).value.offset = 0x999
+    self.emit(tree, 2, outdir)
+    self.assertEqual(os.stat(hpp).st_mtime, 0)
+    # only P2's source holds register offsets
+    self.assertEqual((self.translator.stats.written,
+                      self.translator.stats.unchanged), (1, 5))
+
+if __name__ == '__main__':
+  unittest.main()
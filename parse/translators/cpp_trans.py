@@ -1,62 +1,66 @@
 from contextlib import contextmanager
+import io
+import logging
 import re
 import os
 from ..translators.translator import BaseTranslator, NodeTemplate
-from ..codegen import Indent
+from ..codegen import Indent, write_if_changed
 
 join = os.path.join
+log = logging.getLogger(__name__)
 
 class Translator(BaseTranslator):
-  class Skip(Exception):
-    pass
+  version = 1
 
   def __init__(self):
     pass
 
+  @staticmethod
+  def unit_name(name):
+    m = re.search(r'(?P<name>[A-Z0-9\s]+)Registers?', name)
+    if m:
+      name = m.group('name')
+    return re.sub(r'\s', '_', name.strip())
+
+  @staticmethod
+  def outdir(params):
+    return join(params['OutputDir'], 'auto')
+
+  def outputs(self, name, params):
+    name = self.unit_name(name)
+    return [join(self.outdir(params), CppFile.fname(name, cls.extension))
+            for cls in (CppHeader, CppSource)]
+
   @staticmethod
   def unguard(name):
     return ('#endif  /* __{name}_REGS_HPP_GUARD */\n').format(name=name)
 
   class Device(NodeTemplate):
-    def __enter__(self):
-      self.oldpwd = os.getcwd()
-      os.chdir(self.outdir)
-      return self
-
-    def __exit__(self, etype, evalue, tb):
-      if isinstance(evalue, Translator.Skip):
-        return True
-      os.chdir(self.oldpwd)
-
     def inherit_ctx(self, ctx):
       ctx.device = self
       self.parent_ctx = ctx
-      self.outdir = join(ctx.params['OutputDir'], 'auto')
+      self.stats = ctx.stats
+      self.outdir = Translator.outdir(ctx.params)
       os.makedirs(self.outdir, exist_ok=True)
       return self
 
   class Peripheral(NodeTemplate):
     def __init__(self, node):
       self.node = node
-      m = re.search(r'(?P<name>[A-Z0-9\s]+)Registers?', node.name)
-      if m:
-        name = m.group('name')
-      else:
-        name = node.name
-
-      self.node.name = re.sub(r'\s', '_', name.strip())
+      self.name = Translator.unit_name(node.name)
 
     def inherit_ctx(self, ctx):
-      if self.node.name in ctx.parent_ctx.params['ExcludePeriphs']:
-        print('skipping {} due to exclusion'.format(self.node.name))
+      if self.name in ctx.parent_ctx.params['ExcludePeriphs']:
+        log.info('skipping %s due to exclusion', self.name)
         raise Translator.Skip
       self.parent_ctx = ctx
       return self
 
     def __enter__(self):
-      self.header = CppHeader(self.node.name)
+      device = self.parent_ctx
+      self.header = CppHeader(self.name, device.outdir, stats=device.stats)
       self.header.__enter__()
-      self.source = CppSource(self.node.name)
+      self.source = CppSource(self.name, device.outdir, stats=device.stats)
       self.source.__enter__()
       return self
 
@@ -70,7 +74,7 @@ class Translator(BaseTranslator):
       self.srcf = self.parent_ctx.source.outf
       self.struct  = CppStructUnion(self.node.name, self.hdrf)
       self.struct.__enter__()
-      self.members = CppMemberInit(cls=self.parent_ctx.node.name,
+      self.members = CppMemberInit(cls=self.parent_ctx.name,
                                    name=self.node.name,
                                    addr=self.node.offset,
                                    outf=self.srcf)
@@ -92,16 +96,34 @@ class Translator(BaseTranslator):
       self.parent_ctx.struct.field_ct += 1
 
 class CppFile(NodeTemplate):
-  def __init__(self, name, baseclass=None):
+  """A generated file, rendered in memory and written out whole when
+  the block exits cleanly, so it is either complete or left as it was.
+  A file that would not change is not rewritten.
+  """
+  def __init__(self, name, outdir, baseclass=None, stats=None):
     self.name = name
+    self.outdir = outdir
     self.baseclass = baseclass
+    self.stats = stats
+
+  @staticmethod
+  def fname(name, extension):
+    return re.sub('/', '_', name + extension)
+
+  @property
+  def path(self):
+    return join(self.outdir, self.fname(self.name, self.extension))
 
   def __enter__(self):
-    fname = re.sub('/', '_', self.name + self.extension)
-    self.outf = Indent(open(fname, 'w'))
+    self.buffer = io.StringIO()
+    self.outf = Indent(self.buffer)
     return self
 
-  def __exit__(self, *args, **kwargs):
+  def __exit__(self, etype, evalue, tb):
+    if etype is None:
+      written = write_if_changed(self.path, self.buffer.getvalue())
+      if self.stats:
+        self.stats.record(written)
     self.outf.close()
 
   def guard(self):
@@ -158,7 +180,7 @@ class CppHeader(CppFile):
     self.stopclass()
     self.unnamespace()
     self.unguard()
-    super().__exit__(self, *args, **kwargs)
+    super().__exit__(*args, **kwargs)
 
   def inherit_ctx(self, ctx):
     self.prot_ctx.parent_ctx = ctx
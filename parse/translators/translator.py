@@ -2,11 +2,15 @@ import logging
 from importlib import import_module
 
 from ...common.meta import attach_member_classes
-from ...lex import register
+from ...common import profiling
+from ..codegen import OutputStats
+
+log = logging.getLogger(__name__)
 
 class EmptyContext:
-  def __init__(self, params):
+  def __init__(self, params, stats=None):
     self.params = params
+    self.stats = stats
 
   def __enter__(self):
     return self
@@ -35,18 +39,25 @@ class NodeTemplate:
                         'Register',
                         'Bitfield'])
 class BaseTranslator:
+  # bump when generated output changes, so incremental builds redo it
+  version = 0
+
+  class Skip(Exception):
+    pass
+
   @staticmethod
   def new(lang):
     try:
       return import_module('..' + lang + '_trans', __name__).Translator()
     except (ImportError, AttributeError):
-      logging.error('no translator "{}" found'.format(lang))
+      log.error('no translator "%s" found', lang)
 
   @property
   def node_encoders(self):
     try:
       ret = self._node_encoders
     except AttributeError:
+      from ...lex import register
       ret = self._node_encoders = { getattr(register, x + 'Node') : getattr(self, x)
                                     for x in self.ATTACHED_MEMBERS
                                   }
@@ -54,7 +65,41 @@ class BaseTranslator:
 
   def encode(self, ctx, v):
     emitter = self.node_encoders[type(v)](v)
-    return emitter.inherit_ctx(ctx)
+    try:
+      return emitter.inherit_ctx(ctx)
+    except self.Skip:
+      return None
+
+  @staticmethod
+  def unit_name(name):
+    """Name of the output unit generated for a peripheral.
+    """
+    return name
+
+  def outputs(self, name, params):
+    """Paths of the files generated for the peripheral called name.
+    """
+    return []
+
+  def walk(self, tree, params, jobs=1):
+    """Emit code for tree. With jobs > 1, the subtrees under the root
+    are emitted on that many threads, so translators must keep the state
+    of a subtree in its own contexts. Files written are counted in stats.
+    """
+    with profiling.stage('BaseTranslator.walk'):
+      self.emit(tree, params, jobs)
 
-  def walk(self, tree, params):
-    tree.walk(EmptyContext(params), self.encode)
+  def emit(self, tree, params, jobs):
+    self.stats = OutputStats()
+    root = EmptyContext(params, self.stats)
+    if jobs <= 1:
+      tree.walk(root, self.encode)
+      return
+    from concurrent.futures import ThreadPoolExecutor
+    manager = self.encode(root, tree.value)
+    if manager is None:
+      return
+    with manager as ctx, ThreadPoolExecutor(jobs) as threads:
+      for future in [threads.submit(child.walk, ctx, self.encode)
+                     for child in tree.children.values()]:
+        future.result()